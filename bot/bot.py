@@ -14,7 +14,8 @@ import motor.motor_asyncio
 from discord.ext import commands
 
 import config
-from cogs.utils import i18n, formats
+from cogs.utils import i18n, formats, schema
+from cogs.utils.jobs import JobScheduler
 from cogs.utils.mapping import MapHandler
 from cogs.utils.paginators import PaginationHandler, EmbedPaginator, BetterPaginator
 
@@ -173,6 +174,7 @@ class Abyss(commands.AutoShardedBot):
         self.start_date = None
         self.map_handler = MapHandler(self)
         self.item_cache = None
+        self.jobs = JobScheduler(self)
 
         logger = logging.getLogger('discord')
         # log.setLevel(logging.DEBUG)
@@ -314,8 +316,8 @@ class Abyss(commands.AutoShardedBot):
 
             filename = "cogs." + file
 
-            if filename == "cogs.dbl" and self.cluster_name != "Alpha":
-                continue  # no loady on any other clusters
+            if filename == "cogs.dbl" and self.cluster_name == "beta":
+                continue  # testing bot isnt on dbl, the real clusters share the job
 
             try:
                 self.load_extension(filename)
@@ -338,6 +340,11 @@ class Abyss(commands.AutoShardedBot):
             self.send_error(f"FAILED TO CONNECT TO MONGODB\n```py\n{formats.format_exc(exc)}\n```")
             return
 
+        failed = await schema.ensure_indexes(self.db.abyss)
+        for collection, exc in failed.items():
+            self.log.error(f"couldnt create indexes on {collection}")
+            self.send_error(f"failed to create indexes on `{collection}`\n```py\n{formats.format_exc(exc)}\n```")
+
         try:
             self.redis = await aioredis.create_redis_pool(**config.REDIS, loop=self.loop)
             self.log.info("Redis connection succeeded")
@@ -3,10 +3,13 @@ import random
 
 import discord
 import tabulate
-from discord.ext import commands
+from discord.backoff import ExponentialBackoff
+from discord.ext import commands, tasks
 
 from cogs.utils.formats import ensure_player
 from cogs.utils import battle as bt, formats
+from cogs.utils.encounters import EncounterCatalogue
+from cogs.utils.research import ResearchRecorder
 
 
 class BattleException(commands.CommandError):
@@ -22,9 +25,55 @@ class BattleSystem(commands.Cog):
         self.battles = {}
         self._task = self.bot.loop.create_task(self.task_kill())
         self._queue = asyncio.Queue()
+        self.research = ResearchRecorder(bot)
+        self.enemies = bt.EnemyRegistry(bot)
+        self.encounters = EncounterCatalogue(bot)
+        self.encounter_refresher = tasks.loop(minutes=30, loop=bot.loop)(self.refresh_encounters)
+        self.encounter_refresher.start()
+        self.research_flusher = tasks.loop(seconds=60, loop=bot.loop)(self.research_flusher)
+        self.research_flusher.start()
+        self.bot.unload_tasks[self] = self.bot.loop.create_task(self.flush_research_on_logout())
 
     def cog_unload(self):
         self._task.cancel()
+        self.research_flusher.stop()
+        self.encounter_refresher.cancel()
+        self.bot.unload_tasks.pop(self).cancel()
+        self.bot.loop.create_task(self.research.flush())
+
+    async def refresh_encounters(self, *, retry=True):
+        backoff = ExponentialBackoff()
+        while True:
+            try:
+                count = await self.encounters.refresh()
+            except Exception as exc:
+                self.bot.send_error(f">>> Failed to load encounters\n```py\n{formats.format_exc(exc)}\n```")
+                if not retry or self.encounters.is_ready():
+                    return  # the old ones are still there, next refresh can have another go
+                # nothing loaded yet and commands are waiting on it, so dont leave it for 30 minutes
+                await asyncio.sleep(backoff.delay())
+            else:
+                break
+        self.enemies.clear()  # the prototypes could be out of date now
+        self.bot.log.info(f"loaded {count} encounters")
+        return count
+
+    async def research_flusher(self):
+        try:
+            await self.research.flush()
+        except Exception as exc:
+            self.bot.send_error(f">>> Failed to write demon research\n```py\n{formats.format_exc(exc)}\n```")
+
+    async def flush_research_on_logout(self):
+        await self.bot.wait_for("logout")
+        self.research_flusher.stop()
+        try:
+            count = await self.research.flush()
+        except Exception as exc:
+            # the other unload tasks still need to run
+            self.bot.send_error(f">>> Failed to write demon research\n```py\n{formats.format_exc(exc)}\n```")
+        else:
+            self.bot.log.info(f"flushed demon research for {count} encounters")
 
     async def task_kill(self):
         try:
@@ -52,6 +101,7 @@ class BattleSystem(commands.Cog):
 {battle.players}
 Guild: {battle.ctx.guild} ({battle.ctx.guild.id})
 Encounter: {list(map(str, battle.enemies))}
+Seed: {battle.engine.seed} (turn {battle.turn_cycle})
 ```py
 {formats.format_exc(error)}
 ```"""
@@ -64,15 +114,26 @@ Encounter: {list(map(str, battle.enemies))}
     @commands.is_owner()
     @ensure_player
     async def _encounter(self, ctx, *names):
+        await self.encounters.wait_until_ready()
         enemies = []
         for name in names:
-            encounter = await self.bot.db.abyss.encounters.find_one({"name": name})
-            enemy = bt.Enemy(**encounter)
-            await enemy.populate_skills(self.bot)
+            encounter = self.encounters.get(name)
+            if encounter is None:
+                return await ctx.send(f"No encounter named {name!r}.")
+            enemy = self.enemies.spawn(encounter)
             enemy.skills.remove(self.bot.players.skill_cache['Guard'])
+            enemy.refresh_skills()
             enemies.append(enemy)
         self.battles[ctx.author.id] = bt.WildBattle(ctx.player, ctx, *enemies)
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def _reload_encounters(self, ctx):
+        count = await self.refresh_encounters(retry=False)
+        if count is None:
+            return await ctx.message.add_reaction(self.bot.tick_no)
+        await ctx.send(f"Loaded {count} encounters.")
+
     @commands.command()
     @ensure_player
     @commands.cooldown(5, 120, commands.BucketType.user)
@@ -93,13 +154,12 @@ Encounter: {list(map(str, battle.enemies))}
         # if around is None:
         # raise RuntimeError("story not set :excusemewtf:")
 
-        encounters = await self.bot.db.abyss.encounters.find({
-            "name": {"$in": ctx.player.map.areas[ctx.player.area]['encounters']}
-        }).to_list(None)
+        await self.encounters.wait_until_ready()
+        encounters = self.encounters.in_area(ctx.player.map, ctx.player.area)
 
         enc = random.choices(encounters, k=random.randint(1, 3))
 
-        enemies = [await bt.Enemy(**e, bot=self.bot).populate_skills(self.bot) for e in enc]
+        enemies = [self.enemies.spawn(e) for e in enc]
 
         fastest = max(enemies, key=lambda e: e.agility)
         weights = [50, 50, 50]
@@ -134,7 +194,8 @@ Encounter: {list(map(str, battle.enemies))}
 
     @custom.command()
     async def new(self, ctx):
-        valid = [m['name'] async for m in self.bot.db.abyss.encounters.find()]
+        await self.encounters.wait_until_ready()
+        valid = self.encounters.names()
         data = tabulate.tabulate([valid[x:x + 4] for x in range(0, len(valid), 4)])
         await ctx.send("You'll need a base demon to go off of. Select one from here:")
         task = self.bot.loop.create_task(ctx.send_as_paginator(data, codeblock=True))
@@ -161,7 +222,7 @@ Encounter: {list(map(str, battle.enemies))}
         # 'maps': [754265], 'id': 16,
         # 'desc': "..."}
 
-        demondata = await self.bot.db.abyss.encounters.find_one({"name": valid[nvalid.index(choice)]})
+        demondata = self.encounters.get(choice)
         enemy_data = {'name': demondata['name'], 'desc': demondata['desc']}
         embed = discord.Embed(title=demondata['name'], description=demondata['desc'])
         await ctx.send(f"Great, let's use {demondata['name']}. "
@@ -15,11 +15,14 @@ from typing import Union
 import discord
 import import_expression
 import psutil
+import tabulate
 from discord.ext import commands
 
+from cogs.utils import analysis, schema
 from cogs.utils.battle import TreasureDemonBattle, TreasureDemon
 from cogs.utils.formats import format_exc, ensure_player
 from cogs.utils.paginators import PaginationHandler, BetterPaginator, Timer
+from cogs.utils.player import Player
 from cogs.utils.subprocess import Subprocess
 
 
@@ -531,10 +534,69 @@ Fast-forward
             tdemon = random.choice(filt)
         else:
             tdemon = max(mp_cog.treasure_demon_data, key=lambda f: f['level'])  # return highest
-        enemy = await TreasureDemon(**tdemon).populate_skills(self.bot)
         bt_cog = self.bot.get_cog("BattleSystem")
+        enemy = bt_cog.enemies.spawn(tdemon, TreasureDemon)
         bt_cog.battles[ctx.author.id] = TreasureDemonBattle(ctx.player, ctx, enemy)
 
+    @dev.command()
+    async def analyze(self, ctx, level: int = 10, skill_type=None):
+        cache = self.bot.players.skill_cache
+
+        def runner():
+            demons = []
+            for data in self.bot.players._base_demon_cache.values():
+                skills = [cache[s] for s in data['skills'] if s in cache]
+                demons.append(Player(**{**data, 'owner': 0, 'exp': level ** 3, 'skills': skills}))
+            skills = [s for s in set(cache.values())
+                      if skill_type is None or s.type.name.lower().startswith(skill_type.lower())]
+            return analysis.balance_report(demons, demons, skills), len(demons)
+
+        start = time.perf_counter()
+        rows, count = await self.bot.loop.run_in_executor(None, runner)
+        end = time.perf_counter()
+        table = tabulate.tabulate(
+            [(s.name, s.type.name.title(), s.cost, f"{exp:.1f}", f"{hit:.0%}", f"{crit:.1%}", f"{blocked:.0f}%")
+             for s, exp, hit, crit, blocked in rows],
+            headers=("Skill", "Type", "Cost", "Exp. Dmg", "Hit", "Crit", "No Dmg"),
+            tablefmt='presto')
+        await ctx.send_as_paginator(f"{len(rows)} skills x {count} demons at level {level} "
+                                    f"({(end-start)*1000:.0f}ms)\n\n{table}", codeblock=True)
+
+    @dev.command()
+    async def indexes(self, ctx, create: bool = False):
+        if create:
+            failed = await schema.ensure_indexes(self.bot.db.abyss)
+            for collection, exc in failed.items():
+                await ctx.send(f"`{collection}`: {exc}")
+        status = await schema.index_status(self.bot.db.abyss)
+        table = tabulate.tabulate(
+            [(collection, name, ', '.join(f"{k} {d}" for k, d in keys), 'ok' if exists else 'MISSING')
+             for collection, name, keys, exists in status],
+            headers=("Collection", "Index", "Keys", "Status"),
+            tablefmt='presto')
+        missing = sum(not exists for *_, exists in status)
+        await ctx.send_as_paginator(f"{missing} missing\n\n{table}", codeblock=True)
+
+    @dev.command()
+    async def jobs(self, ctx):
+        last = await self.bot.jobs.last_runs()
+        rows = []
+        for name, job in self.bot.jobs.jobs.items():
+            ran = last.get(name, {})
+            rows.append((
+                name,
+                'global' if job.cluster_wide else 'local',
+                f"{job.every}s",
+                job.runs,
+                job.failures,
+                job.skipped,
+                f"{job.last_duration * 1000:.0f}ms" if job.last_duration is not None else '-',
+                f"{ran['cluster']} ({float(ran['duration']) * 1000:.0f}ms)" if ran else '-'
+            ))
+        table = tabulate.tabulate(rows, headers=("Job", "Scope", "Every", "Runs", "Failed", "Skipped", "Last here",
+                                                 "Last anywhere"), tablefmt='presto')
+        await ctx.send_as_paginator(f"{self.bot.cluster_name}\n\n{table}", codeblock=True)
+
     @dev.group()
     async def config(self, ctx):
         pass
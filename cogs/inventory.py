@@ -4,47 +4,20 @@ from datetime import datetime, timedelta
 import discord
 from discord.ext import commands
 
+from .utils.crafting import CraftScheduler
 from .utils.items import Unusable, Craftable, HealingItem
 from .utils.formats import ensure_player
 from .utils.paginators import EmbedPaginator, PaginationHandler
-from .utils.player import Player
 
 
 class Inventory(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._task = None
-        self.relaunch_task()
-
-    def convert_ts_to_seconds(self, ts):
-        return (ts - datetime.utcnow()).total_seconds()
-
-    async def craft_waiter(self):
-        await self.bot.prepared.wait()
-        self.bot.log.info('craft task initialized')
-        while True:
-            task = await self.bot.db.abyss.crafttasks.find({}).sort('after').to_list(1)
-            if not task:
-                break
-            task = task[0]
-            ts = task['after']
-            await asyncio.sleep(self.convert_ts_to_seconds(ts))
-            self.bot.dispatch('craft_complete', task)
-            await self.bot.db.abyss.crafttasks.delete_one(task)
-        self.bot.log.info('all craft tasks completed')
+        self.crafting = CraftScheduler(bot)
+        self.crafting.start()
 
     def cog_unload(self):
-        try:
-            self._task.cancel()
-        except:
-            pass
-
-    def relaunch_task(self):
-        try:
-            self._task.cancel()
-        except:
-            pass
-        self._task = self.bot.loop.create_task(self.craft_waiter())
+        self.crafting.stop()
 
     async def new_craft_task(self, ctx, item):
         nd = datetime.utcnow()
@@ -55,11 +28,10 @@ class Inventory(commands.Cog):
             'count': item.makes,
             'after': nd,  # datetime when complete
             'channel': ctx.channel.id,  # for notifications
+            'guild': ctx.guild.id if ctx.guild else None,  # decides which cluster finishes it
             'msg': ctx.message.jump_url
         }
-        await self.bot.db.abyss.crafttasks.insert_one(pd)
-        self.relaunch_task()
-        return pd
+        return await self.crafting.add(pd)
 
     @commands.Cog.listener()
     async def on_craft_complete(self, crafting_data):
@@ -74,18 +46,11 @@ Obtained **{crafting_data['count']} {crafting_data['item']}**!
 '''
         item = self.bot.item_cache.get_item(crafting_data['item'])
         # todo: when clustering, send an op to recache the player if it exists
-        if user.id not in self.bot.players.players:
-            pdata = await self.bot.db.abyss.accounts.find_one({"owner": user.id})
-            if not pdata:
-                return  # the player was deleted i guess?
-            player = await Player(**pdata).populate_skills(self.bot)
-            for i in range(crafting_data['count']):
-                player.inventory.add_item(item)
-            await player.save(self.bot)
-        else:  # player is cached
-            player = self.bot.players.players[user.id]
-            for i in range(crafting_data['count']):
-                player.inventory.add_item(item)
+        player = await self.bot.players.players.load(user.id)
+        if player is None:
+            return  # the player was deleted i guess?
+        for i in range(crafting_data['count']):
+            player.inventory.add_item(item)
         if channel is not None and channel.permissions_for(channel.guild.me).send_messages:
             await channel.send(msg)
         else:
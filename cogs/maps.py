@@ -4,6 +4,7 @@ import random
 
 import discord
 
+from cogs.utils import userkeys
 from cogs.utils.battle import TreasureDemon, TreasureDemonBattle
 from cogs.utils.formats import *
 from cogs.utils.paginators import EmbedPaginator, PaginationHandler
@@ -66,7 +67,10 @@ class Maps(commands.Cog, name="Exploration"):
     async def search(self, ctx):
         """Looks around to see what you can interact with.
         Has a chance of spawning an enemy, interrupting the search."""
-        await self.bot.redis.set(f'{ctx.author.id}:searchedmap-{ctx.player.map.name}:{ctx.player.area}', 1)
+        key = f'{ctx.author.id}:searchedmap-{ctx.player.map.name}:{ctx.player.area}'
+        pipe = userkeys.register(self.bot.redis.pipeline(), ctx.author.id, key)
+        pipe.set(key, 1)
+        await pipe.execute()
         tcount = ctx.player.map.areas[ctx.player.area]['treasurecount']
         locs = sum(1 for i in ctx.player.map.areas[ctx.player.area]['interactions'] if i['type'] == 0)
         chests = sum(1 for i in ctx.player.map.areas[ctx.player.area]['interactions'] if i['type'] == 1)
@@ -185,7 +189,9 @@ class Maps(commands.Cog, name="Exploration"):
             if not await ctx.confirm("This chest is locked. Use **Lockpick**?"):
                 return
             ctx.player.inventory.remove_item('Lockpick')
-        await self.bot.redis.hset(f'open_chests:{ctx.author.id}', str(chest_id), '1')
+        pipe = userkeys.register(self.bot.redis.pipeline(), ctx.author.id, f'open_chests:{ctx.author.id}')
+        pipe.hset(f'open_chests:{ctx.author.id}', str(chest_id), '1')
+        await pipe.execute()
         item = ctx.bot.item_cache.get_item(goto['command'])
         await ctx.send(f"You opened the chest and obtained **{item.name}**!")
         ctx.player.inventory.add_item(item)
@@ -228,8 +234,8 @@ class Maps(commands.Cog, name="Exploration"):
                 # a higher level to the player, so we just select
                 # the highest level one instead
                 tdemon = max(self.treasure_demon_data, key=lambda f: f['level'])  # return highest
-            enemy = await TreasureDemon(**tdemon).populate_skills(self.bot)
             bt_cog = self.bot.get_cog("BattleSystem")
+            enemy = bt_cog.enemies.spawn(tdemon, TreasureDemon)
             bt_cog.battles[ctx.author.id] = TreasureDemonBattle(ctx.player, ctx, enemy)
 
 
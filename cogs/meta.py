@@ -96,11 +96,8 @@ Created by {', '.join(str(ctx.bot.get_user(u)) for u in ctx.bot.config.OWNERS)}"
         season = weather.get_current_season()
         embed = discord.Embed(title=f"Weekly Forecast: {_now.strftime('%B')} ({season.name.title()})")
         embed.description = ""
-        for day in range(0, 7):
-            date = start + timedelta(days=day)
+        for date, current_weather, wind_speed in weather.get_forecast(start, 7):
             day = date.strftime("%a")
-            current_weather = weather.get_current_weather(date)
-            wind_speed = weather.get_wind_speed(date)
             fmt = f"{current_weather.name.replace('_', ' ').title()}"
             if date.day == _now.day:
                 embed.description += f"> `{day} {date.strftime('%d')}: {fmt} ({wind_speed}km/h wind speed)`\n"
@@ -124,7 +121,7 @@ Created by {', '.join(str(ctx.bot.get_user(u)) for u in ctx.bot.config.OWNERS)}"
             mem_info = self.proc.memory_full_info().uss / 1024 / 1024
         except psutil.AccessDenied:
             mem_info = self.proc.memory_info().rss / 1024 / 1024
-        player_count = await ctx.bot.db.abyss.accounts.count_documents({})
+        player_count = await ctx.bot.db.abyss.accounts.estimated_document_count()
         try:
             platform = R.findall(subprocess.run(['/usr/bin/lsb_release', '-d'],
                                                 capture_output=True,
@@ -3,21 +3,26 @@ import contextlib
 import itertools
 import json
 import random
+import time
 from operator import itemgetter
 
 import discord
-from discord.ext import commands, ui
+from discord.ext import commands, tasks, ui
 
 from cogs.utils import (
+    formats,
     lookups,
     # imaging,
-    items
+    items,
+    schema,
+    userkeys
 )
+from cogs.utils.cache import PlayerCache
 from cogs.utils.enums import SkillType
 from cogs.utils.formats import ensure_player
 from cogs.utils.objects import CaseInsensitiveDict
 from cogs.utils.paginators import EmbedPaginator, PaginationHandler
-from cogs.utils.player import Player
+from cogs.utils.player import Player, migrate_player_state
 from cogs.utils.skills import Skill, GenericAttack, Guard
 
 NL = '\n'
@@ -204,7 +209,7 @@ def ensure_no_player(func):
     async def predicate(ctx):
         if ctx.author.id in ctx.bot.players.players:
             return False
-        if await ctx.bot.db.abyss.accounts.find_one({"owner": ctx.author.id}) is not None:
+        if await ctx.bot.db.abyss.accounts.find_one({"owner": ctx.author.id}, schema.EXISTS) is not None:
             return False
         return True
 
@@ -214,12 +219,15 @@ def ensure_no_player(func):
 class Players(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.players = {}
+        self.players = PlayerCache(bot)
         self.skill_cache = CaseInsensitiveDict({"Attack": GenericAttack, "Guard": Guard})
         self._base_demon_cache = {}
         self.bot.unload_tasks[self] = self._unloader_task = self.bot.loop.create_task(self.flush_cached_players())
         self.cache_skills()
         bot.item_cache = items._ItemCache(self)
+        self.player_flusher = tasks.loop(seconds=120, loop=bot.loop)(self.player_flusher)
+        self.player_flusher.start()
+        self.bot.loop.create_task(self.run_migrations())
 
     def __repr__(self):
         return f"<PlayerHandler {len(self.players)} loaded, {len(self.skill_cache)} skills>"
@@ -227,12 +235,42 @@ class Players(commands.Cog):
     def cog_unload(self):
         task = self.bot.unload_tasks.pop(self)
         task.cancel()
+        self.player_flusher.cancel()
+        self.bot.loop.create_task(self.players.flush())
+
+    async def player_flusher(self):
+        try:
+            evicted = await self.players.evict_idle()
+            saved = await self.players.flush()
+        except Exception as exc:
+            self.bot.send_error(f">>> Player flusher failed\n```py\n{formats.format_exc(exc)}\n```")
+            return
+        if evicted or saved:
+            self.bot.log.debug(f"player flush: {evicted} evicted, {saved} saved")
+
+    async def run_migrations(self):
+        # one time redis migrations, the flag keys make sure only one cluster runs each
+        await self.bot.prepared.wait()
+        for name, migration in (('pstate', migrate_player_state), ('userkeys', userkeys.backfill)):
+            flag = f'migrations:{name}'
+            if not await self.bot.redis.set(flag, 1, exist=self.bot.redis.SET_IF_NOT_EXIST):
+                continue  # another cluster did it already
+            try:
+                count = await migration(self.bot.redis)
+            except Exception as exc:
+                await self.bot.redis.delete(flag)
+                self.bot.send_error(f">>> Failed to run the {name} migration\n```py\n{formats.format_exc(exc)}\n```")
+                return
+            self.bot.log.info(f"{name} migration: {count} done")
 
     async def flush_cached_players(self):
         await self.bot.wait_for("logout")
-        for _ in range(len(self.players)):
-            _, player = self.players.popitem()
-            await player.save(self.bot)
+        # a save the flusher had going keeps running, flush waits for it before saving whats left
+        self.player_flusher.cancel()
+        start = time.perf_counter()
+        saved = await self.players.flush()
+        self.bot.log.info(f"flushed {saved}/{len(self.players)} cached players in {time.perf_counter() - start:.2f}s")
+        self.players.clear()
 
     def cache_skills(self):
         with open("skill-data.json") as file:
@@ -331,13 +369,9 @@ class Players(commands.Cog):
 
         await asyncio.gather(msg1.delete(), msg2.delete())
 
-        scandata = await self.bot.redis.scan(0, match=f'*{ctx.author.id}*', count=1000)
-        for key in scandata[1]:
-            if key.startswith(b'locale'):
-                continue  # keep locale settings
-            await self.bot.redis.delete(key)
-
-        self.players.pop(ctx.author.id)
+        # out of the cache first, a save after this would write them back
+        await self.players.discard(ctx.author.id)
+        await userkeys.delete_all(self.bot.redis, ctx.author.id)  # locale settings arent in there
         await self.bot.db.abyss.accounts.delete_one({"owner": ctx.author.id})
         await ctx.send(self.bot.tick_yes)
 
@@ -384,6 +418,7 @@ class Players(commands.Cog):
             return await ctx.send("You can't equip more than 8 skills.")
         ctx.player.skills.append(skill)
         ctx.player.unset_skills.remove(skill)
+        ctx.player.refresh_skills()
         await ctx.send(self.bot.tick_yes)
 
     @commands.command()
@@ -410,6 +445,7 @@ class Players(commands.Cog):
             return await ctx.send("You must equip at least 1 skill.")
         ctx.player.unset_skills.append(skill)
         ctx.player.skills.remove(skill)
+        ctx.player.refresh_skills()
         await ctx.send(self.bot.tick_yes)
 
 
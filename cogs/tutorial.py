@@ -2,7 +2,7 @@ import asyncio
 
 from discord.ext import commands
 
-from cogs.utils.battle import Enemy, WildBattle
+from cogs.utils.battle import WildBattle
 
 
 class Tutorial(commands.Cog):
@@ -61,8 +61,9 @@ class Tutorial(commands.Cog):
                                  timeout=180):
             return
         bt_cog = self.bot.get_cog('BattleSystem')
-        data = await self.bot.db.abyss.encounters.find_one({"name": "Arsene"})
-        en = await Enemy(**data).populate_skills(self.bot)
+        await bt_cog.encounters.wait_until_ready()
+        data = bt_cog.encounters.get("Arsene")
+        en = bt_cog.enemies.spawn(data)
         bt_cog.battles[ctx.author.id] = bt = WildBattle(player, ctx, en, ambush=True)
         await asyncio.sleep(3)
         if not await ctx.confirm(
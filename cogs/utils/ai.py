@@ -0,0 +1,204 @@
+"""
+How enemies pick their moves.
+
+Every enemy carries a SkillBook, built once when its skills are set, which
+keeps its SP skills sorted by cost so the affordable ones are a bisect away.
+The policies here all have the (engine, user) -> (skill, targets) signature
+BattleEngine expects, and pay for the skill they pick like random_move does.
+
+Each enemy gets one of POLICIES from the `ai` key of its encounter (random if
+it doesnt have one), and enemy_policy plays it. A battle can pass a policy of
+its own to use for every enemy instead.
+"""
+
+import bisect
+
+from .engine import UNSUPPORTED_SKILLS, random_policy, usable_skills
+from .enums import AilmentType, ResistanceModifier, SkillType, StatModifier
+from .skills import Charge, HealingSkill, StatusMod
+
+# how much a hit is worth against each resistance
+RESISTANCE_SCORE = {
+    ResistanceModifier.WEAK: 2.0,
+    ResistanceModifier.NORMAL: 1.0,
+    ResistanceModifier.RESIST: 0.5,
+    ResistanceModifier.IMMUNE: 0.0,
+    ResistanceModifier.REFLECT: -1.0,
+    ResistanceModifier.ABSORB: -1.0
+}
+
+HEAL_BELOW = 0.5  # heal an ally under half hp
+
+
+class SkillBook:
+    """
+    skills   - every skill that isnt a passive, in the order the user has them
+    costs    - sp costs of the sp skills, sorted, lined up with `paid`
+    unusable - names the ai learned dont work in this battle
+    """
+    __slots__ = ('skills', 'paid', 'costs', 'cost_of', 'weight', 'unusable', '_cached_at', '_cached')
+
+    def __init__(self, user):
+        self.skills = tuple(s for s in user.skills if s.type is not SkillType.PASSIVE)
+        halved = user.has_skill('Spell Master')
+        self.cost_of = {s.name: (s.cost / 2 if halved else s.cost) if s.uses_sp else 0 for s in self.skills}
+        self.paid = sorted((s for s in self.skills if s.uses_sp), key=lambda s: self.cost_of[s.name])
+        self.costs = [self.cost_of[s.name] for s in self.paid]
+        # what a use is worth before resistances, only needs working out once
+        self.weight = {s.name: s.severity.value * sum(s.hits) / 2 for s in self.skills if s.is_damaging_skill}
+        self.unusable = set()
+        self._cached_at = None
+        self._cached = ()
+
+    def __repr__(self):
+        return f"<SkillBook {len(self.skills)} skills, {len(self.unusable)} unusable>"
+
+    def fresh(self):
+        # same skills, nothing learnt yet
+        book = object.__new__(SkillBook)
+        book.skills, book.paid, book.costs = self.skills, self.paid, self.costs
+        book.cost_of, book.weight = self.cost_of, self.weight
+        book.unusable = set()
+        book._cached_at = None
+        book._cached = ()
+        return book
+
+    def cost(self, skill):
+        try:
+            return self.cost_of[skill.name]
+        except KeyError:
+            return skill.cost if skill.uses_sp else 0
+
+    def mark_unusable(self, name):
+        if name not in self.unusable:
+            self.unusable.add(name)
+            self._cached_at = None
+
+    def affordable(self, sp):
+        # only gets rebuilt when sp crosses the cost of a skill (or the ai learnt something)
+        index = bisect.bisect_right(self.costs, sp)
+        if index != self._cached_at:
+            paid = {s.name for s in self.paid[:index]}
+            self._cached = tuple(s for s in self.skills
+                                 if (not s.uses_sp or s.name in paid) and s.name not in self.unusable)
+            self._cached_at = index
+        return self._cached
+
+
+def _choices(engine, user):
+    if hasattr(user, 'book'):
+        return user.book.affordable(user.sp)
+    return usable_skills(user)
+
+
+def _pick(engine, user, skill, targets=None):
+    if hasattr(user, 'pay_for'):
+        user.pay_for(skill)
+    return skill, targets or engine.filter_targets(skill, user)
+
+
+def _sides(engine, user):
+    if engine.is_player(user):
+        foes, allies = engine.enemies, engine.players
+    else:
+        foes, allies = engine.players, engine.enemies
+    return [f for f in foes if not f.is_fainted()], [a for a in allies if not a.is_fainted()]
+
+
+def _score(engine, user, skill, foes):
+    weight = user.book.weight.get(skill.name) if hasattr(user, 'book') else None
+    if weight is None:
+        weight = skill.severity.value * sum(skill.hits) / 2
+    scores = []
+    for foe in foes:
+        resistance = foe.effective_resistance(skill.type)
+        if skill.is_instant_kill:
+            # only worth it when it has a real chance of landing
+            scores.append(3.0 if resistance is ResistanceModifier.WEAK else 0.0)
+        else:
+            scores.append(weight * RESISTANCE_SCORE[resistance])
+    if skill.target in ('enemies', 'all'):
+        return sum(scores), None
+    best = max(range(len(foes)), key=scores.__getitem__)
+    return scores[best], (foes[best],)
+
+
+def resistance_policy(engine, user):
+    """Picks the damaging skill that scores best against the other sides resistances.
+
+    Falls back to random_policy when nothing scores above 0."""
+    if user.ailment and user.ailment.type is AilmentType.FORGET:
+        return random_policy(engine, user)
+    foes, _ = _sides(engine, user)
+    if not foes:
+        return random_policy(engine, user)
+    best, best_score, best_targets = [], 0.0, None
+    for skill in _choices(engine, user):
+        if not skill.is_damaging_skill or skill.name in UNSUPPORTED_SKILLS:
+            continue
+        score, targets = _score(engine, user, skill, foes)
+        if score > best_score:
+            best, best_score, best_targets = [(skill, targets)], score, targets
+        elif score == best_score and best:
+            best.append((skill, targets))
+    if not best:
+        return random_policy(engine, user)
+    skill, best_targets = engine.rng.choice(best)
+    return _pick(engine, user, skill, best_targets)
+
+
+def _support_use(skill, user, foes, allies):
+    # (worth using, targets) for a support skill, targets None means let the engine pick
+    if isinstance(skill, HealingSkill):
+        hurt = [a for a in allies if a.hp < a.max_hp * HEAL_BELOW]
+        if not hurt:
+            return False, None
+        if skill.target == 'ally':
+            return True, (min(hurt, key=lambda a: a.hp / a.max_hp),)
+        return True, None
+    if isinstance(skill, Charge):
+        return not (user.concentrating if skill.name == 'Concentrate' else user.charging), None
+    if isinstance(skill, StatusMod):
+        if skill.name == 'Heat Riser':
+            return any(min(a.stat_mod) < 1 for a in allies), None
+        if skill.name == 'Debilitate':
+            return any(max(f.stat_mod) > -1 for f in foes), None
+        if skill.name == 'Dekaja':
+            return any(max(f.stat_mod) > 0 for f in foes), None
+        if skill.name == 'Dekunda':
+            return any(min(a.stat_mod) < 0 for a in allies), None
+        mod = StatModifier[skill.name[:4].upper()].value
+        if skill.name.endswith('kaja'):
+            return any(a.stat_mod[mod] < 1 for a in allies), None
+        return any(f.stat_mod[mod] > -1 for f in foes), None
+    return False, None
+
+
+def support_policy(engine, user):
+    """Heals a hurt ally, or buffs/debuffs when it would change something, before attacking.
+
+    Otherwise it plays like resistance_policy."""
+    if user.ailment and user.ailment.type is AilmentType.FORGET:
+        return random_policy(engine, user)
+    foes, allies = _sides(engine, user)
+    choices = [s for s in _choices(engine, user) if s.name not in UNSUPPORTED_SKILLS]
+    # heals go first, then everything else in the order the user has them
+    for skill in sorted(choices, key=lambda s: not isinstance(s, HealingSkill)):
+        if skill.is_damaging_skill:
+            continue
+        worth, targets = _support_use(skill, user, foes, allies)
+        if worth:
+            return _pick(engine, user, skill, targets)
+    return resistance_policy(engine, user)
+
+
+POLICIES = {
+    'random': random_policy,
+    'resistance': resistance_policy,
+    'support': support_policy
+}
+
+
+def enemy_policy(engine, user):
+    """Plays whichever policy the enemy was set up with, random_policy for anyone else."""
+    return getattr(user, 'policy', random_policy)(engine, user)
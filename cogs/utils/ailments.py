@@ -1,4 +1,3 @@
-import asyncio
 import functools
 import operator
 import random
@@ -25,16 +24,17 @@ class _Ailment:
     cannot_move_msg = "> __{self.player}__ can't move!"
     # the message to display when UserIsImmobilized gets raised
 
-    def __init__(self, player, type):
+    def __init__(self, player, type, rng=None):
         self.type = type
         self.player = player
         self.counter = 0
-        if any(s.name == 'Fast Heal' for s in player.skills):
-            self.clear_at = random.randint(1, 4)
-        elif any(s.name == 'Insta-Heal' for s in player.skills):
+        self.rng = rng or random
+        if player.has_skill('Fast Heal'):
+            self.clear_at = self.rng.randint(1, 4)
+        elif player.has_skill('Insta-Heal'):
             self.clear_at = 1
         else:
-            self.clear_at = random.randint(2, 7)
+            self.clear_at = self.rng.randint(2, 7)
 
     def __repr__(self):
         return f"<Ailment: {self.name}, {self.player!r}, {self.counter}, {self.type!r}>"
@@ -51,7 +51,9 @@ class _Ailment:
             raise AilmentRemoved
         self.counter += 1
 
-    async def pre_turn_effect_async(self, battle):  # pylint: disable=unused-argument
+    def battle_turn_effect(self, battle, out):  # pylint: disable=unused-argument
+        # same as pre_turn_effect, but with access to the battle
+        # any lines to show get appended to `out` before raising
         self.pre_turn_effect()
 
     def post_turn_effect(self):
@@ -98,7 +100,7 @@ class Shock(_Ailment):
 
     def pre_turn_effect(self):
         super().pre_turn_effect()
-        if random.randint(1, 10) != 1:
+        if self.rng.randint(1, 10) != 1:
             raise UserIsImmobilized
 
 
@@ -153,19 +155,19 @@ class Fear(_Ailment, Exception):
 
     def pre_turn_effect(self):
         super().pre_turn_effect()
-        if random.randint(1, 10) != 1:
+        if self.rng.randint(1, 10) != 1:
             raise UserIsImmobilized
-        if random.randint(1, 10) == 1:
+        if self.rng.randint(1, 10) == 1:
             raise self
 
 
 def _skill_cost(player, skill):
     cost = skill.cost
     if skill.uses_sp:
-        if any(ss.name == 'Spell Master' for ss in player.skills):
+        if player.has_skill('Spell Master'):
             cost = cost / 2
         return player.sp >= cost
-    if any(ss.name == 'Arms Master' for ss in player.skills):
+    if player.has_skill('Arms Master'):
         cost = cost / 2
     cost = player.max_hp * (cost / 100)  # we wanted a % smh
     return player.hp > cost
@@ -177,17 +179,16 @@ class Confuse(_Ailment):
     """
     emote = "\u2754"
 
-    async def pre_turn_effect_async(self, battle):
+    def battle_turn_effect(self, battle, out):
         self.pre_turn_effect()
-        choice = random.randint(1, 5)
+        choice = self.rng.randint(1, 5)
         # 1 -> throw away item
         # 2 -> throw away credits
         # 3 -> do nothing
         # 4 -> use a random skill
         # 5 -> continue as normal
         if choice != 5:
-            await battle.ctx.send(f"> __{self.player}__ is confused!")
-            await asyncio.sleep(1.1)
+            out.append(f"> __{self.player}__ is confused!")
         if choice == 1:
             if not self.player.inventory.items:
                 choice = 3
@@ -195,13 +196,13 @@ class Confuse(_Ailment):
                 items = functools.reduce(operator.add, self.player.inventory.items.values())
                 if not items:
                     raise UserTurnInterrupted()
-                select = random.choice(items)
+                select = self.rng.choice(items)
                 self.player.inventory.remove_item(select.name)
-                await battle.ctx.send(f"Threw away 1x `{select}`!")
+                out.append(f"Threw away 1x `{select}`!")
                 raise UserTurnInterrupted()
         if choice == 2:
             # todo: when credits are added, add chance to throw them away during confusion
-            await battle.ctx.send(f"Threw away `0` Credits!")
+            out.append(f"Threw away `0` Credits!")
             raise UserTurnInterrupted()
         if choice == 3:
             raise UserTurnInterrupted()
@@ -212,7 +213,7 @@ class Confuse(_Ailment):
             # select = random.choice(itertools.filterfalse(
             #     lambda s: s.type is not SkillType.PASSIVE, self.player.skills))
             # if select.uses_sp:
-            #     if any(s.name == 'Spell Master' for s in self.player.skills):
+            #     if self.player.has_skill('Spell Master'):
             #         cost = select.cost/2
             #     else:
             #         cost = select.cost
@@ -242,41 +243,41 @@ class Brainwash(_Ailment):
     """
     emote = "\N{PLAYING CARD BLACK JOKER}"
 
-    async def pre_turn_effect_async(self, battle):
+    def battle_turn_effect(self, battle, out):
         self.pre_turn_effect()
-        choice = random.choice((True, False))
+        choice = self.rng.choice((True, False))
         if choice:
-            await battle.ctx.send(f"> __{self.player}__ is brainwashed!")
-            await asyncio.sleep(1)
+            out.append(f"> __{self.player}__ is brainwashed!")
             skills = [s for s in self.player.skills if s.type in (SkillType.SUPPORT, SkillType.HEALING)
                       and s.target != 'self' and _skill_cost(self.player, s) and s.name != 'Guard']
             if not skills:
                 raise UserTurnInterrupted
-            skill = random.choice(skills)
+            skill = self.rng.choice(skills)
             if skill.uses_sp:
-                if any(s.name == 'Spell Master' for s in self.player.skills):
+                if self.player.has_skill('Spell Master'):
                     cost = skill.cost/2
                 else:
                     cost = skill.cost
                 self.player.sp = cost
             else:
-                if any(s.name == 'Arms Master' for s in self.player.skills):
+                if self.player.has_skill('Arms Master'):
                     cost = skill.cost/2
                 else:
                     cost = skill.cost
                 cost = self.player.max_hp * (cost / 100)
                 self.player.hp = cost
-            await battle.ctx.send(f"__{self.player}__ used `{skill}`!")
+            out.append(f"__{self.player}__ used `{skill}`!")
             if self.player in battle.players:
                 if skill.target in ('enemy', 'enemies'):
-                    await skill.effect(battle, battle.players)
+                    targets = battle.players
                 else:
-                    await skill.effect(battle, battle.enemies)
+                    targets = battle.enemies
             else:
                 if skill.target in ('enemy', 'enemies'):
-                    await skill.effect(battle, battle.enemies)
+                    targets = battle.enemies
                 else:
-                    await skill.effect(battle, battle.players)
+                    targets = battle.players
+            out.extend(skill.apply(self.player, targets, self.rng))
             raise UserTurnInterrupted
 
 
@@ -287,6 +288,6 @@ class Rage(_Ailment):
     """
     emote = '\N{POUTING FACE}'
 
-    async def pre_turn_effect_async(self, battle):
+    def battle_turn_effect(self, battle, out):
         self.pre_turn_effect()
         raise UserIsImmobilized  # temp, fixme
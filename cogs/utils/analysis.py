@@ -0,0 +1,224 @@
+"""
+Vectorised damage maths for whole attacker x target x skill grids.
+
+This mirrors Player.take_damage / try_crit / try_evade and Skill.damage_calc,
+but gives back probabilities and expected values instead of rolling.
+Stat modifiers, charge and concentrate are taken from the objects as they are
+right now. Guarding, ailments, karns and shields are ignored, so the numbers
+are for a target that has none of those up.
+"""
+
+import numpy as np
+
+from .enums import ResistanceModifier, SevereWeather, SkillType, StatModifier, Weather
+from .lookups import WEATHER_TO_TYPE
+from .player import CRITICAL_BASE
+from .skills import SKILL_BASE
+from . import weather as _weather
+
+RESISTANCE_MULT = {
+    ResistanceModifier.WEAK: 1.5,
+    ResistanceModifier.NORMAL: 1.0,
+    ResistanceModifier.RESIST: 0.5,
+    ResistanceModifier.IMMUNE: 0.0,
+    ResistanceModifier.REFLECT: 0.0,  # goes back to the attacker instead
+    ResistanceModifier.ABSORB: -0.5   # heals for half
+}
+
+DAMAGE_RNG = (0.75, 1.25)
+
+
+def _weather_type(current_weather):
+    name = WEATHER_TO_TYPE.get(current_weather.name)
+    if name is None:
+        return None
+    try:
+        return SkillType[name]
+    except KeyError:
+        return None  # THUNDER_STORM maps to "ELEC" which isnt a type
+
+
+def _chance(base):
+    # P(uniform(1, 100) <= base)
+    return np.clip((base - 1) / 99, 0, 1)
+
+
+def _expected_floor(base):
+    # E[max(1, base * uniform(0.75, 1.25))], done exactly instead of just max(1, base)
+    lo, hi = DAMAGE_RNG
+    base = np.maximum(base, 1e-9)
+    cut = np.clip(1 / base, lo, hi)
+    return ((cut - lo) + base * (hi ** 2 - cut ** 2) / 2) / (hi - lo)
+
+
+class DamageTable:
+    """
+    Every array is indexed [attacker, target, skill].
+
+    damage   - expected damage of one hit that lands, without a critical
+    hit      - chance the first hit lands
+    crit     - chance of a critical (0 for skills that cant crit)
+    expected - expected total damage of one use, with all hits, crits and misses
+    """
+    __slots__ = ('attackers', 'targets', 'skills', 'damage', 'hit', 'crit', 'expected')
+
+    def __init__(self, attackers, targets, skills, damage, hit, crit, expected):
+        self.attackers = attackers
+        self.targets = targets
+        self.skills = skills
+        self.damage = damage
+        self.hit = hit
+        self.crit = crit
+        self.expected = expected
+
+    def __repr__(self):
+        return f"<DamageTable {self.expected.shape}>"
+
+    def best_skill(self, attacker=0, *, mask=None):
+        # best skill for one attacker, summed across every target it would hit
+        total = self.expected[attacker].sum(axis=0)
+        if mask is not None:
+            total = np.where(mask, total, -np.inf)
+        if not np.isfinite(total).any():
+            return None
+        return self.skills[int(np.argmax(total))]
+
+
+def damage_table(attackers, targets, skills, *, date=None):
+    attackers, targets, skills = list(attackers), list(targets), list(skills)
+    current_weather = _weather.get_current_weather(date)
+    wind_speed = _weather.get_wind_speed(date)
+    weather_type = _weather_type(current_weather)
+
+    def attr(objs, func):
+        return np.array([func(o) for o in objs], dtype=float)
+
+    # skills -> (1, 1, S)
+    s_uses_sp = attr(skills, lambda s: s.uses_sp).astype(bool)[None, None, :]
+    s_severity = attr(skills, lambda s: s.severity.value)[None, None, :]
+    s_accuracy = attr(skills, lambda s: s.accuracy)[None, None, :]
+    s_instant = attr(skills, lambda s: s.is_instant_kill).astype(bool)[None, None, :]
+    s_damaging = attr(skills, lambda s: s.is_damaging_skill).astype(bool)[None, None, :]
+    s_hits = attr(skills, lambda s: sum(s.hits) / 2)[None, None, :]
+    s_almighty = attr(skills, lambda s: s.type is SkillType.ALMIGHTY).astype(bool)[None, None, :]
+    s_wind = attr(skills, lambda s: s.type is SkillType.WIND).astype(bool)[None, None, :]
+    s_weather = attr(skills, lambda s: s.type is weather_type).astype(bool)[None, None, :]
+
+    # attackers -> (A, 1, 1), or (A, 1, S) where it depends on the skill
+    a_strength = attr(attackers, lambda a: a.strength)[:, None, None]
+    a_magic = attr(attackers, lambda a: a.magic)[:, None, None]
+    a_level = attr(attackers, lambda a: a.level)[:, None, None]
+    a_agility = attr(attackers, lambda a: a.agility)[:, None, None]
+    a_luck = attr(attackers, lambda a: a.luck)[:, None, None]
+    a_taru = attr(attackers, lambda a: a.affected_by(StatModifier.TARU))[:, None, None]
+    a_suku = attr(attackers, lambda a: a.affected_by(StatModifier.SUKU))[:, None, None]
+    a_crit_mod = attr(attackers, lambda a: a._ex_crit_mod * (3 if a.has_skill('Apt Pupil') else 1)
+                      * (2 if a._rebellion[0] else 1))[:, None, None]
+    a_charging = attr(attackers, lambda a: a.charging)[:, None, None].astype(bool)
+    a_concentrating = attr(attackers, lambda a: a.concentrating)[:, None, None].astype(bool)
+    a_ailment_boost = attr(attackers, lambda a: a.has_skill('Ailment Boost'))[:, None, None].astype(bool)
+    a_ambient_aid = attr(attackers, lambda a: a.has_skill('Ambient Aid'))[:, None, None].astype(bool)
+    a_boost = np.array([[a.get_boost_amp_mod(s.type) for s in skills] for a in attackers], dtype=float)[:, None, :]
+
+    # targets -> (1, T, 1), or (1, T, S)
+    t_endurance = attr(targets, lambda t: t.endurance)[None, :, None]
+    t_level = attr(targets, lambda t: t.level)[None, :, None]
+    t_agility = attr(targets, lambda t: t.agility)[None, :, None]
+    t_luck = attr(targets, lambda t: t.luck)[None, :, None]
+    t_hp = attr(targets, lambda t: t.hp)[None, :, None]
+    t_raku = attr(targets, lambda t: t.affected_by(StatModifier.RAKU))[None, :, None]
+    t_suku = attr(targets, lambda t: t.affected_by(StatModifier.SUKU))[None, :, None]
+    t_sharp = attr(targets, lambda t: t.has_skill('Sharp Student'))[None, :, None].astype(bool)
+    t_firm = attr(targets, lambda t: t.has_skill('Firm Stance'))[None, :, None].astype(bool)
+    t_angelic = attr(targets, lambda t: t.has_skill('Angelic Grace'))[None, :, None].astype(bool)
+    t_rainy = attr(targets, lambda t: t.has_skill('Rainy Play'))[None, :, None].astype(bool)
+    t_ali = attr(targets, lambda t: t.has_skill('Ali Dance'))[None, :, None].astype(bool)
+    resistances = [[t.effective_resistance(s.type) for s in skills] for t in targets]
+    t_res = np.array([[RESISTANCE_MULT[r] for r in row] for row in resistances], dtype=float)[None, :, :]
+    t_weak = np.array([[r is ResistanceModifier.WEAK for r in row] for row in resistances])[None, :, :]
+    t_resist = np.array([[r is ResistanceModifier.RESIST for r in row] for row in resistances])[None, :, :]
+    t_blocked = np.array([[r in (ResistanceModifier.IMMUNE, ResistanceModifier.REFLECT) for r in row]
+                          for row in resistances])[None, :, :]
+    t_evasion = np.array([[(t.get_passive_evasion(s.type).immunity_handle() if t.get_passive_evasion(s.type) else 0)
+                           for s in skills] for t in targets], dtype=float)[None, :, :]
+
+    # -- damage_calc -- #
+    stat = np.where(s_uses_sp, a_magic, a_strength)
+    base = 5 * np.sqrt(stat / t_endurance * SKILL_BASE)
+    base = base * a_taru / t_raku
+    base = base + (a_level - t_level)
+    wmod = 3 if isinstance(current_weather, SevereWeather) else 2
+    base = np.where(s_weather, base * wmod, base)
+    base = np.where(s_wind, base + wind_speed, base)
+    charged = np.where(s_uses_sp, a_concentrating, a_charging)
+    base = np.where(charged, base * 2.5, base)
+    base = _expected_floor(base)
+
+    # -- take_damage -- #
+    base = base * a_boost
+    damage = np.ceil(base * t_res * s_severity)  # ceil of the mean, close enough
+    damage = np.where(t_firm, damage / 2, damage)
+    damage = np.where(s_instant, t_hp, damage)
+    damage = np.where(s_damaging & ~t_blocked, damage, 0)
+
+    # -- try_crit -- #
+    crit = CRITICAL_BASE * a_crit_mod
+    crit = np.where(t_sharp, crit / 3, crit)
+    crit = crit + ((a_luck / 10) - ((t_luck / 2) / 10))
+    crit = crit / t_suku * a_suku
+    crit = _chance(crit)
+    crit = np.where(~s_uses_sp & ~t_weak & ~s_instant, crit, 0.0)
+
+    # -- try_evade -- #
+    hit = np.where(
+        s_instant,
+        s_accuracy - (t_luck / 10) / 2 + a_boost,
+        (s_accuracy + a_agility / 2) - (t_agility / 10) / 2
+    )
+    hit = np.where(s_instant & t_weak, hit / 1.1, hit)
+    hit = np.where(s_instant & t_resist, hit / 0.9, hit)
+    hit = np.where(a_ailment_boost, hit * 1.25, hit)
+    hit = hit - t_evasion
+    hit = hit / t_suku * a_suku
+    hit = np.where(s_uses_sp & ~s_almighty & t_angelic, hit / 2, hit)
+    if current_weather is Weather.RAIN:
+        hit = np.where(t_rainy, hit / 2, hit)
+        hit = np.where(a_ambient_aid, hit * 2, hit)
+    elif current_weather is SevereWeather.THUNDER_STORM:
+        hit = np.where(t_rainy, hit / 3, hit)
+    hit = np.where(t_ali, hit / 2, hit)
+    hit = _chance(hit)
+    hit = np.where(t_firm, 1.0, hit)
+    hit = np.where(t_blocked, 0.0, hit)
+
+    per_hit = damage * (1 - crit) + damage * 1.75 * crit
+    expected = hit * per_hit * np.where(s_instant, 1, s_hits)
+    return DamageTable(attackers, targets, skills, damage, hit, crit, expected)
+
+
+def chunked(attackers, targets, skills, *, size=16, date=None):
+    # yields DamageTables for slices of attackers so big grids dont eat all the memory
+    attackers = list(attackers)
+    for start in range(0, len(attackers), size):
+        yield damage_table(attackers[start:start+size], targets, skills, date=date)
+
+
+def balance_report(attackers, targets, skills, *, date=None):
+    """Averages every skill across all attacker/target pairs.
+
+    Returns [(skill, mean expected damage, mean hit chance, mean crit chance, % of pairs doing no damage)]"""
+    skills = [s for s in skills if s.is_damaging_skill]
+    expected = np.zeros(len(skills))
+    hit = np.zeros(len(skills))
+    crit = np.zeros(len(skills))
+    blocked = np.zeros(len(skills))
+    pairs = 0
+    for table in chunked(attackers, targets, skills, date=date):
+        expected += table.expected.sum(axis=(0, 1))
+        hit += table.hit.sum(axis=(0, 1))
+        crit += table.crit.sum(axis=(0, 1))
+        blocked += (table.damage <= 0).sum(axis=(0, 1))
+        pairs += table.expected.shape[0] * table.expected.shape[1]
+    pairs = max(pairs, 1)
+    return sorted(zip(skills, expected / pairs, hit / pairs, crit / pairs, blocked / pairs * 100),
+                  key=lambda r: r[1], reverse=True)
@@ -1,6 +1,11 @@
-from . import i18n
+import asyncio
+import copy
+
+from . import formats, i18n
+from .ai import POLICIES, SkillBook, enemy_policy
 from .ailments import *
-from .objects import ListCycle
+from .engine import BattleEngine
+from .inventory import Inventory
 from .player import Player
 from .scripts import do_script
 from .skills import *
@@ -8,11 +13,6 @@ from .targetting import *
 
 NL = '\n'
 
-UNSUPPORTED_SKILLS = ['Growth 1', 'Growth 2', 'Growth 3',
-                      'Amrita Shower', 'Amrita Drop',
-                      'Fortify Spirit', 'Recarm', 'Samarecarm',
-                      'Rebellion', 'Revolution', 'Foul Breath', 'Stagnant Air']
-
 
 class Enemy(Player):
     # wild encounters dont have a skill preference or an ai
@@ -22,15 +22,38 @@ class Enemy(Player):
 
     # true battles will automatically avoid skills that you are immune to,
     # and aim for skills that you are weak to / support themself
+    # an encounter can get that with its `ai` key, see ai.POLICIES
+    __slots__ = ('level_', 'book', 'policy')
+
     def __init__(self, **kwargs):
         kwargs['skills'] = kwargs.pop("moves")
         self.level_ = kwargs.pop("level")
+        self.policy = POLICIES[kwargs.pop("ai", "random")]
         kwargs['arcana'] = 0
         kwargs['exp'] = 0
         kwargs['owner'] = 0
         kwargs['specialty'] = 'almighty'
         super().__init__(**kwargs)
-        self.unusable_skills = []  # a list of names the ai has learned not to use since they dont work
+
+    @classmethod
+    def prototype(cls, data, skill_cache):
+        # resolves the skills straight away, so theres no populate_skills (and no redis) needed
+        data = dict(data)
+        data['moves'] = [skill_cache[name] for name in sorted({'Attack', 'Guard', *data['moves']})]
+        enemy = cls(**data)
+        enemy.inventory = Inventory(None, enemy, {})  # always empty, but ailments like confuse look in it
+        return enemy
+
+    def spawn(self):
+        # a fresh copy for one battle, everything that doesnt change during a battle is shared
+        enemy = copy.copy(self)
+        enemy.skills = list(self.skills)
+        enemy.book = self.book.fresh()
+        enemy.inventory = Inventory(None, enemy, {})
+        enemy.damage_taken = 0
+        enemy.sp_used = 0
+        enemy.reset_battle_state()
+        return enemy
 
     def get_exp(self):
         state = random.Random(int(''.join(map(str, map(ord, self.name)))))
@@ -45,36 +68,32 @@ class Enemy(Player):
     def level(self):
         return self.level_
 
-    def skill_filter(self):
-        for skill in self.skills:
-            if skill.type is SkillType.PASSIVE:
-                continue
-            if skill.name in self.unusable_skills:
-                continue
-            if not skill.uses_sp:
-                yield skill
-                continue
-            if any(s.name == 'Spell Master' for s in self.skills):
-                c = skill.cost / 2
-            else:
-                c = skill.cost
-            if c <= self.sp:
-                yield skill
+    def refresh_skills(self):
+        super().refresh_skills()
+        self.book = SkillBook(self)
+
+    @property
+    def unusable_skills(self):
+        # names the ai has learned not to use since they dont work
+        return self.book.unusable
 
-    def random_move(self):
+    def random_move(self, rng=None):
+        rng = rng or random
         if self.ailment and self.ailment.type is AilmentType.FORGET:
             return GenericAttack
-        choices = list(self.skill_filter())
-        select = random.choice(choices or (GenericAttack,))
-        if select.uses_sp:
-            if any(s.name == 'Spell Master' for s in self.skills):
-                self.sp = select.cost / 2
-            else:
-                self.sp = select.cost
+        select = rng.choice(self.book.affordable(self.sp) or (GenericAttack,))
+        self.pay_for(select)
         return select
 
+    def pay_for(self, skill):
+        # enemies only pay sp, physical skills are free for them
+        if skill.uses_sp:
+            self.sp = self.book.cost(skill)
+
 
 class TreasureDemon(Enemy):
+    __slots__ = ()
+
     def header(self):
         return f'[Treasure] {self.name}' + (f' {self.ailment.emote}' if self.ailment else '')
 
@@ -89,6 +108,36 @@ class TreasureDemon(Enemy):
         return None
 
 
+class EnemyRegistry:
+    """
+    Builds each enemy from its document once and hands out copies of it for battles.
+
+    (class, name) -> prototype
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self._prototypes = {}
+
+    def __repr__(self):
+        return f"<EnemyRegistry {len(self._prototypes)} prototypes>"
+
+    def __len__(self):
+        return len(self._prototypes)
+
+    def get_prototype(self, data, cls=Enemy):
+        try:
+            return self._prototypes[cls, data['name']]
+        except KeyError:
+            proto = self._prototypes[cls, data['name']] = cls.prototype(data, self.bot.players.skill_cache)
+            return proto
+
+    def spawn(self, data, cls=Enemy):
+        return self.get_prototype(data, cls).spawn()
+
+    def clear(self):
+        self._prototypes.clear()
+
+
 class BattleResult:
     def __init__(self):
         self.flee = False
@@ -150,32 +199,78 @@ def get_message(resistance, *, reflect=False, miss=False, critical=False):
     return msg
 
 
+class MessageBuffer:
+    # collects the lines of a turn so they go out as one message instead of one per hit
+    # discord.py already waits on the ratelimit headers, so no sleeping between sends
+    def __init__(self, destination, limit=1900):
+        self.destination = destination
+        self.limit = limit
+        self.lines = []
+        self.size = 0
+
+    def __repr__(self):
+        return f"<MessageBuffer {len(self.lines)} lines, {self.size} chars>"
+
+    async def add(self, line):
+        if self.lines and self.size + len(line) + 1 > self.limit:
+            await self.flush()
+        self.lines.append(line)
+        self.size += len(line) + 1
+
+    async def flush(self):
+        if not self.lines:
+            return
+        content = NL.join(self.lines)
+        self.lines.clear()
+        self.size = 0
+        await self.destination.send(content)
+
+
 class WildBattle:
-    def __init__(self, player, ctx, *enemies, ambush=None):
+    def __init__(self, player, ctx, *enemies, ambush=None, players=None, seed=None, policy=None):
         self.ctx = ctx
-        self.cmd = self.ctx.bot.get_cog("BattleSystem").cog_command_error
-        self.players = (player,)
+        cog = self.ctx.bot.get_cog("BattleSystem")
+        self.cmd = cog.cog_command_error
+        self.research = cog.research
+        # the engine does the actual rules, we just do the talking
+        # policy, if given, is played by every enemy instead of their own
+        self.engine = BattleEngine(players or (player,), enemies, ambush=ambush, seed=seed,
+                                   enemy_policy=policy or enemy_policy)
         self.menu = None
-        self.turn_cycle = 0
-        self.enemies = sorted(enemies, key=lambda e: e.agility, reverse=True)
-        self.ambush = ambush
-        # True -> player got the initiative
-        # False -> enemy got the jump
-        # None -> proceed by agility
+        self.output = MessageBuffer(ctx)
         self._stopping = False
-        self._ran = False
-        if self.ambush is True:
-            self.order = [*self.players, *self.enemies]
-        elif self.ambush is False:
-            self.order = [*self.enemies, *self.players]
-        else:
-            self.order = sorted([*self.players, *self.enemies], key=lambda i: i.agility, reverse=True)
-        self.double_turn = False
-        self.order = ListCycle(self.order)
         self._task = self.start()
         self.log = self.ctx.bot.log
         self._turn_task = None
 
+    @property
+    def players(self):
+        return self.engine.players
+
+    @property
+    def enemies(self):
+        return self.engine.enemies
+
+    @property
+    def order(self):
+        return self.engine.order
+
+    @property
+    def ambush(self):
+        return self.engine.ambush
+
+    @property
+    def turn_cycle(self):
+        return self.engine.turn_cycle
+
+    @property
+    def double_turn(self):
+        return self.engine.double_turn
+
+    @double_turn.setter
+    def double_turn(self, value):
+        self.engine.double_turn = value
+
     def task_end(self, task):
         asyncio.ensure_future(self.post_battle_complete(), loop=self.ctx.bot.loop)
 
@@ -195,12 +290,56 @@ class WildBattle:
         return task
 
     async def stop(self):
+        with suppress(discord.HTTPException):
+            await self.output.flush()
         self._stopping = True
+        self.engine.stop()
         self._task.cancel()
         with suppress(AttributeError):
             await self.menu.stop()
 
+    def start_message(self):
+        if self.ambush is True:
+            return "> {0} {1}! You surprised {2}!".format(
+                len(self.enemies),
+                _('enemy') if len(self.enemies) == 1 else _('enemies'),
+                _('it') if len(self.enemies) == 1 else _('them')
+            )
+        elif self.ambush is False:
+            return "> It's an ambush! There {2} {0} {1}!".format(
+                len(self.enemies), _('enemy') if len(self.enemies) == 1 else _('enemies'),
+                _('is') if len(self.enemies) == 1 else _('are')
+            )
+        return "> There {2} {0} {1}! Attack!".format(
+            len(self.enemies), _('enemy') if len(self.enemies) == 1 else _('enemies'),
+            _('is') if len(self.enemies) == 1 else _('are'))
+
+    async def render(self, events):
+        for event in events:
+            if event.kind == 'start':
+                await self.output.add(self.start_message())
+            elif event.kind == 'hit':
+                res = event.result
+                if self.engine.is_player(event.user) and event.skill.type.value <= 10:
+                    self.research.record_resistance(event.user.owner.id, event.target.name, event.skill.type,
+                                                    res.resistance)
+                msg = get_message(res.resistance, reflect=res.was_reflected, miss=res.miss, critical=res.critical)
+                msg = msg.format(demon=event.user, tdemon=event.target, damage=res.damage_dealt, skill=event.skill)
+                await self.output.add(msg)
+            elif event.kind == 'guard':
+                if not self.engine.is_player(event.user):
+                    await self.output.add(f"__{event.user}__ guarded!")
+            elif event.kind == 'unsupported':
+                if self.engine.is_player(event.user):
+                    await self.output.add("this skill doesnt have a handler, this incident has been reported")
+                    self.ctx.bot.send_error(f"no skill handler for {event.skill}")
+                else:
+                    await self.output.add(f"{event.user} used an unhandled skill ({event.skill.name}), skipping")
+            elif event.message:
+                await self.output.add(event.message)
+
     async def get_player_choice(self, player):
+        await self.output.flush()
         self.menu = InitialSession(self, player)
         await self.menu.start(self.ctx)
         try:
@@ -209,353 +348,59 @@ class WildBattle:
             await self.menu.stop()
 
     async def handle_player_choices(self, player):
-        # self.log.debug(f"player choices begin {player!r}")
-        if not self.double_turn:
-            # self.log.debug("not a double turn, run pre turn effects")
-            await player.pre_turn_async(self)
-        self.double_turn = False
+        self.engine.pre_turn(player)
+        await self.render(self.engine.drain())
         result = await self.get_player_choice(player)
-        # self.log.debug(f"got player choices {result!r}")
         if result is None and not self._stopping:
             self.order.decycle()  # shitty way to do it but w.e
-            # self.log.debug(f"stopping due to (result is None)({result is None}) (not self._stopping)({not self._stopping})")
             return await self.stop()
 
         if self._stopping:
-            # self.log.debug("self._stopping is True")
             return
 
         if result['type'] == 'run':
-            # self.log.debug("result['type'] == 'run'")
             if result['data'].get('timeout', False) or result['data'].get('success', True):
-                self._ran = True
-                await self.ctx.send("> You successfully ran away!")
+                self.engine.ran = True
+                await self.output.add("> You successfully ran away!")
                 await self.stop()
-                # self.log.debug("run was successful")
             else:
-                await self.ctx.send("> You failed to escape!")
-                # self.log.debug("run was NOT successful")
+                await self.output.add("> You failed to escape!")
             return
 
         # type must be fight
         skill = result['data']['skill']
-        # self.log.debug(f"got {skill!r} as a skill")
-
-        if skill.name == "Guard":
-            player.guarding = True
-            # self.log.debug("we did a guard")
-            return
-
-        targets = result['data']['targets']
-        # self.log.debug(f"got {targets!r} as targets")
-
-        if skill.name in UNSUPPORTED_SKILLS:
-            await self.ctx.send("this skill doesnt have a handler, this incident has been reported")
-            self.ctx.bot.send_error(f"no skill handler for {skill}")
-            self.order.decycle()
-            # self.log.debug('skill did not have a handler and was skipped')
-            self.double_turn = True
-            return
-
-        if skill.uses_sp:
-            # self.log.debug("skill uses sp")
-            cost = skill.cost
-            # self.log.debug(f"skill.cost == {cost}")
-            if any(s.name == 'Spell Master' for s in player.skills):
-                cost /= 2
-                # self.log.debug("cost was halved due to spell master")
-            if player.sp < cost:
-                await self.ctx.send("You don't have enough SP for this move!")
-                # self.log.debug("not enough sp for skill, reverting turn cycle")
-                self.double_turn = True
-                return self.order.decycle()
-            if skill.name != 'Guard' and player.ailment and player.ailment.type is AilmentType.FORGET:
-                await self.ctx.send("You've forgotten how to use this move!")
-                self.double_turn = True
-                # self.log.debug("user forgot skill, reverting turn cycle")
-                return self.order.decycle()
-            player.sp = cost
-            # self.log.debug("subtracted cost from sp")
-        else:
-            # self.log.debug("skill uses hp")
-            if skill.cost != 0:
-                cost = player.max_hp * (skill.cost / 100)
-                # self.log.debug(f"cost calculated to {cost}/{skill.cost}")
-                if any(s.name == 'Arms Master' for s in player.skills):
-                    cost /= 2
-                    # self.log.debug("lowering cost due to Arms Master")
-            else:
-                cost = 0
-            # self.log.debug(f'skill.cost == {cost}')
-            if cost > player.hp:
-                # self.log.debug("not enough hp to use skill")
-                await self.ctx.send("You don't have enough HP for this move!")
-                self.double_turn = True
-                return self.order.decycle()
-            if skill.name != 'Attack' and player.ailment and player.ailment.type is AilmentType.FORGET:
-                await self.ctx.send("You've forgotten how to use this move!")
-                self.double_turn = True
-                # self.log.debug("forgot how to use skill")
-                return self.order.decycle()
-            player.hp = cost
-            # self.log.debug("subtracted cost from HP")
-
-        if isinstance(skill, (StatusMod, ShieldSkill, HealingSkill, Karn, Charge, AilmentSkill)):
-            await self.ctx.send(f"__{player}__ used `{skill}`!")
-            await skill.effect(self, targets)
-            # self.log.debug("skill is StatusMod, ShieldSkill, HealingSkill, Karn, Charge or Ailment")
-            return
-
-        weaked = False
-        # log.debug(f'{targets}, {skill.hits}')
-        for target in targets:
-            force_crit = 0
-            # self.log.debug(f"attacking enemy {target!r}")
-
-            for __ in range(random.randint(*skill.hits)):
-                # self.log.debug(f'hit enemy {target!r} {__} times')
-                if target.is_fainted():
-                    # self.log.debug('enemy was fainted')
-                    break  # no point hitting the dead
-                await asyncio.sleep(1.1)
-                res = target.take_damage(player, skill, enforce_crit=force_crit)
-                # self.log.debug(f"damage result {res!r}")
-                # before we do any message stuff, we have to update the db
-                # especially if the result is a miss, itll just return instantly
-
-                if skill.type.value <= 10:
-                    # self.log.debug("skill type is CURSE or less")
-                    bot = self.ctx.bot
-                    data = await bot.db.abyss.demonresearch.find_one({"user_id": player.owner.id, "enemy": target.name})
-                    if data:
-                        await bot.db.abyss.demonresearch.update_one({'_id': data['_id']}, {
-                            "$set": {
-                                f"resistances.{skill.type.value-1}": res.resistance.value
-                            }})
-                        # self.log.debug("updated existing data")
-                    else:
-                        ress = [-1 for a in range(10)]
-                        ress[skill.type.value-1] = res.resistance.value
-                        await bot.db.abyss.demonresearch.insert_one({
-                            "user_id": player.owner.id,
-                            "enemy": target.name,
-                            "resistances": ress,
-                            "moves": []
-                        })
-                        # self.log.debug("added new data")
-
-                # this is to ensure crits only happen IF the first hit did land a crit
-                # we use a Triboolean:
-                # 0: first hit, determine crit
-                # 1: first hit passed, it was a crit
-                # 2: first hit passed, was not a crit
-                force_crit = 1 if res.critical else 2
-                # self.log.debug(f'forcing crit: {force_crit==1}')
-                msg = get_message(res.resistance, reflect=res.was_reflected, miss=res.miss, critical=res.critical)
-                msg = msg.format(demon=player, tdemon=target, damage=res.damage_dealt, skill=skill)
-                # self.log.debug(msg)
-                await self.ctx.send(msg)
-                if res.endured:
-                    await self.ctx.send(f"> __{target}__ endured the hit!")
-                    # self.log.debug('target endured the hit via Endure or Enduring Soul')
-
-                if res.miss:
-                    # the first hit was a miss, so just break
-                    # the back door is explained in utils/player.py#L526
-                    # self.log.debug("multihit miss backdoor was closed")
-                    break
-
-                if skill.type is SkillType.PHYSICAL:
-                    if target.ailment and target.ailment.type is AilmentType.SLEEP:
-                        if random.randint(1, 6) != 1:
-                            target.ailment = None
-                            await self.ctx.send(f"> __{target}__ woke up!")
-                            # self.log.debug('target awoke due to physical skill')
-
-                if skill.name == 'Attack':
-                    if target.ailment and target.ailment.type is AilmentType.SHOCK:
-                        if not player.ailment and random.randint(1, 3) == 1:
-                            player.ailment = ailments.Shock(player, AilmentType.SHOCK)
-                            await self.ctx.send(f"> __{player}__ was inflicted with **Shock**!")
-                            # self.log.debug("player was shocked due to GenericAttack")
-                    elif not target.ailment and player.ailment and player.ailment.type is AilmentType.SHOCK:
-                        target.ailment = ailments.Shock(target, AilmentType.SHOCK)
-                        await self.ctx.send(f"> __{target}__ was inflicted with **Shock**!")
-                        # self.log.debug("target was shocked due to GenericAttack")
-
-                if res.did_weak:
-                    # self.log.debug("managed to land a weak or critical")
-                    weaked = True
-        if skill.uses_sp:  # reset here so all hits of a skill are charged up
-            player.concentrating = False
-            # self.log.debug("stopped concentrating")
-        else:
-            player.charging = False
-            # self.log.debug("stopped charging")
-
-        if weaked and confirm_not_dead(self):
-            # self.log.debug("doing another turn due to knock down")
-            self.order.decycle()
-            self.double_turn = True
-            await self.ctx.send("> Nice hit! Move again!")
-        # self.log.debug("end of function")
-
-    def filter_targets(self, skill, user):
-        if skill.target == 'enemies':
-            return self.players
-        elif skill.target == 'enemy':
-            return random.choice(self.players),
-        elif skill.target == 'self':
-            return user,
-        elif skill.target == 'ally':
-            return random.choice([e for e in self.enemies if not e.is_fainted()]),
-        elif skill.target == 'allies':
-            return [e for e in self.enemies if not e.is_fainted()]
-        elif skill.target == 'all':
-            return [*self.players] + [e for e in self.enemies if not e.is_fainted()]
+        targets = result['data'].get('targets', ())
+        self.engine.use_skill(player, skill, targets)
+        await self.render(self.engine.drain())
 
     async def handle_enemy_choices(self, enemy):
-        """
-        mongodb.demonresearch.find_one({"enemy": enemy name, "user_id": player id})
-        {
-            "_id": ...,
-            "enemy": "enemy name",
-            "user_id": player id,
-            "resistances": [
-                -1,  # unknown
-                0,   # null
-                1,   # resist
-                2,   # normal
-                3,   # weak
-                4,   # repel
-                5,   # absorb
-                -1,
-                -1,
-                -1
-            ],
-            "moves": []  # append moves as learnt
-        }
-        """
-        if not self.double_turn:
-            await enemy.pre_turn_async(self)
-        self.double_turn = False
-        skill = enemy.random_move()
+        engine = self.engine
+        engine.pre_turn(enemy)
+        await self.render(engine.drain())
+        skill, targets = engine.enemy_policy(engine, enemy)
         if skill.name not in ('Attack', 'Guard'):
-            bot = self.ctx.bot  # no need to keep these
             for p in self.players:
-                data = await bot.db.abyss.demonresearch.find_one({"user_id": p.owner.id, "enemy": enemy.name})
-                if data:
-                    await bot.db.abyss.demonresearch.update_one({"_id": data['_id']},
-                                                                {"$addToSet": {"moves": skill.name}})
-                else:
-                    await bot.db.abyss.demonresearch.insert_one({
-                        "user_id": p.owner.id,
-                        "enemy": enemy.name,
-                        "resistances": [-1 for _z in range(10)],
-                        "moves": [skill.name]
-                    })
-        if skill.name in UNSUPPORTED_SKILLS:
-            await self.ctx.send(f"{enemy} used an unhandled skill ({skill.name}), skipping")
-            return
-        targets = self.filter_targets(skill, enemy)
-        if isinstance(skill, (StatusMod, ShieldSkill, HealingSkill, Karn, Charge, AilmentSkill)):
-            await self.ctx.send(f"__{enemy}__ used `{skill}`!")
-            await skill.effect(self, targets)
-            return
-
-        if skill.name == 'Guard':
-            await self.ctx.send(f"__{enemy}__ guarded!")
-            enemy.guarding = True
-            return
-
-        # log.debug(f"enemy: {targets}, {skill.hits}")
-        for target in targets:
-            weaked = False
-            force_crit = 0
-
-            for a in range(random.randint(*skill.hits)):
-                await asyncio.sleep(1.1)  # we are sending messages too fast tbh
-                res = target.take_damage(enemy, skill, enforce_crit=force_crit)
-                force_crit = 1 if res.critical else 2
-                if res.did_weak:
-                    weaked = True
-
-                if res.resistance in (
-                        ResistanceModifier.IMMUNE,
-                        ResistanceModifier.REFLECT,
-                        ResistanceModifier.ABSORB
-                ):
-                    enemy.unusable_skills.append(skill.name)
-                    # the ai learns not to use it in the future, but still use it this turn
-
-                msg = get_message(res.resistance, reflect=res.was_reflected, miss=res.miss, critical=res.critical)
-                msg = msg.format(demon=enemy, tdemon=target, damage=res.damage_dealt, skill=skill)
-                await self.ctx.send(msg)
-
-                if skill.type is SkillType.PHYSICAL:
-                    if target.ailment and target.ailment.type is AilmentType.SLEEP:
-                        if random.randint(1, 6) != 1:
-                            target.ailment = None
-                            await self.ctx.send(f"> __{target}__ woke up!")
-
-                if skill.name == 'Attack':
-                    if target.ailment and target.ailment.type is AilmentType.SHOCK:
-                        if not enemy.ailment and random.randint(1, 3) == 1:
-                            enemy.ailment = ailments.Shock(enemy, AilmentType.SHOCK)
-                            await self.ctx.send(f"> __{enemy}__ was inflicted with **Shock**!")
-                    elif not target.ailment and enemy.ailment and enemy.ailment.type is AilmentType.SHOCK:
-                        target.ailment = ailments.Shock(target, AilmentType.SHOCK)
-                        await self.ctx.send(f"> __{target}__ was inflicted with **Shock**!")
-
-            if skill.uses_sp:
-                enemy.concentrating = False
-            else:
-                enemy.charging = False
-
-            if weaked and not target.is_fainted():
-                self.order.decycle()
-                self.double_turn = True
-                await self.ctx.send("> Watch out, {demon} is attacking again!".format(demon=enemy))
+                self.research.record_move(p.owner.id, enemy.name, skill.name)
+        engine.use_skill(enemy, skill, targets)
+        await self.render(engine.drain())
 
     async def main(self):
-        # log.debug("starting loop")
-        if not confirm_not_dead(self):
-            # log.debug("confirm not dead failed, stopping")
+        engine = self.engine
+        if engine.is_over():
             await self.stop()
             return
         nxt = self.order.active()
 
-        try:
-            if not nxt.is_fainted() and nxt.ailment is not None:
-                await nxt.ailment.pre_turn_effect_async(self)
-        except UserIsImmobilized:
-            await self.ctx.send(nxt.ailment.cannot_move_msg.format(self=nxt.ailment))
-            self.order.cycle()
+        can_act = engine.start_turn(nxt)
+        await self.render(engine.drain())
+        if engine.stopped:
+            await self.stop()  # player ran away
             return
-        except AilmentRemoved:
-            await self.ctx.send(f"> __{nxt}__'s {nxt.ailment.name} wore off!")
-            nxt.ailment = None
-        except Fear:
-            await self.ctx.send(f"> __{nxt}__ ran away!")
-            if isinstance(nxt, Enemy):
-                nxt.hp = nxt.max_hp  # faint the enemy ig lol
-            else:
-                await self.stop()
-                self._ran = True
-                return  # player ran away
-            self.order.cycle()
-        except UserTurnInterrupted:
-            # await self.ctx.send("turn interrupted but no handler has been done")
-            self.order.cycle()
-            return  # no handler rn
-
-        if not isinstance(nxt, Enemy):
-            # log.debug("next: player")
-            if not self.double_turn:
-                if self.ambush and any(s.name == 'Heat Up' for s in nxt.skills):
-                    nxt.hp = -(nxt.max_hp * 0.05)
-                    nxt.sp = -10
-                self.turn_cycle += 1
+        if not can_act:
+            await self.output.flush()
+            return
+
+        if engine.is_player(nxt):
             self._turn_task = self.ctx.bot.loop.create_task(self.handle_player_choices(nxt))
             try:
                 await self._turn_task
@@ -564,75 +409,30 @@ class WildBattle:
             finally:
                 self._turn_task = None
                 await self.menu.stop()
-        else:
-            if not nxt.is_fainted():
-                # log.debug("next enemy not fainted")
-                if not self.double_turn:
-                    if self.ambush is False and any(s.name == 'Heat Up' for s in nxt.skills):
-                        nxt.hp = -(nxt.max_hp * 0.05)
-                        nxt.sp = -10
-                self._turn_task = self.ctx.bot.loop.create_task(self.handle_enemy_choices(nxt))
-                try:
-                    await self._turn_task
-                except asyncio.CancelledError:
-                    pass
-                finally:
-                    self._turn_task = None
-            else:
-                self.order.remove(nxt)
-        if not nxt.is_fainted() and nxt.ailment is not None:
-            nxt.ailment.post_turn_effect()
-        self.order.cycle()
+        elif not nxt.is_fainted():
+            self._turn_task = self.ctx.bot.loop.create_task(self.handle_enemy_choices(nxt))
+            try:
+                await self._turn_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._turn_task = None
+        engine.end_turn(nxt)
+        await self.render(engine.drain())
+        await self.output.flush()
 
     async def pre_battle_start(self):
-        # log.debug("pre battle, determining ambush")
-        if self.ambush is True:
-            # log.debug("player initiative")
-            await self.ctx.send("> {0} {1}! You surprised {2}!".format(
-                len(self.enemies),
-                _('enemy') if len(self.enemies) == 1 else _('enemies'),
-                _('it') if len(self.enemies) == 1 else _('them')
-            ))
-
-            for e in self.enemies:
-                if any(s.name == 'Adverse Resolve' for s in e.skills):
-                    e._ex_crit_mod += 5.0
-                if any(s.name == 'Pressing Stance' for s in e.skills):
-                    e._ex_evasion_mod += 3.0
-
-            for p in self.players:
-                if any(s.name == 'Fortified Moxy' for s in p.skills):
-                    p._ex_crit_mod += 2.5
-
-        elif self.ambush is False:
-            # log.debug("enemy initiative")
-            await self.ctx.send("> It's an ambush! There {2} {0} {1}!".format(
-                len(self.enemies), _('enemy') if len(self.enemies) == 1 else _('enemies'),
-                _('is') if len(self.enemies) == 1 else _('are')
-            ))
-
-            for p in self.players:
-                if any(s.name == 'Adverse Resolve' for s in p.skills):
-                    p._ex_crit_mod += 5.0
-                if any(s.name == 'Pressing Stance' for s in p.skills):
-                    p._ex_evasion_mod += 3.0
-
-            for e in self.enemies:
-                if any(s.name == 'Fortified Moxy' for s in e.skills):
-                    e._ex_crit_mod += 2.5
-        else:
-            # log.debug("regular initiative")
-            await self.ctx.send("> There {2} {0} {1}! Attack!".format(
-                len(self.enemies), _('enemy') if len(self.enemies) == 1 else _('enemies'),
-                _('is') if len(self.enemies) == 1 else _('are')))
-
-        for p in self.players:
-            p.pre_battle()
-        for e in self.enemies:
-            e.pre_battle()
+        self.engine.pre_battle()
+        await self.render(self.engine.drain())
 
     async def post_battle_complete(self):
         # log.debug("complete")
+        with suppress(discord.HTTPException):
+            await self.output.flush()  # anything left over if the battle errored
+        try:
+            await self.research.flush()
+        except Exception as exc:
+            self.ctx.bot.send_error(f">>> Failed to write demon research\n```py\n{formats.format_exc(exc)}\n```")
         if not self._task.cancelled() and self._task.exception():
             err = self._task.exception()
             # log.debug(f"error occured: {err!r}")
@@ -660,7 +460,7 @@ class WildBattle:
 
         await self.cmd(self.ctx, None, battle=self)
 
-        if self._ran:
+        if self.engine.ran:
             msg = "That was a close one.\n0 EXP and 0 Credits earned."
             exp = 0
             cash = 0
@@ -672,17 +472,17 @@ class WildBattle:
         for p in self.players:
             p.exp += exp
             p.credits += cash
-            p.post_battle(self._ran)
+            p.post_battle(self.engine.ran)
         await self.ctx.send(msg)
         # log.debug("finish")
 
 
 class PVPBattle(WildBattle):
     def __init__(self, ctx, *, teama, teamb):
-        super().__init__(None, ctx, *teamb)
-        self.players = tuple(teama)
+        super().__init__(None, ctx, *teamb, players=teama)
 
     async def get_player_choice(self, player):
+        await self.output.flush()
         self.menu = InitialSession(self, player)
         try:
             await self.menu.start(self.ctx, dm=True)
@@ -694,21 +494,21 @@ class PVPBattle(WildBattle):
 class TreasureDemonBattle(WildBattle):
     def __init__(self, *args):
         super().__init__(*args)
-        self.run_after = random.randint(2, 4)
+        self.run_after = self.engine.rng.randint(2, 4)
 
     async def handle_enemy_choices(self, enemy):
         if self.turn_cycle == self.run_after:
-            await self.ctx.send(f"> **{enemy.name}** ran away!")
-            self._ran = True
+            await self.output.add(f"> **{enemy.name}** ran away!")
+            self.engine.ran = True
             await self.stop()
         else:
-            await self.ctx.send(f"> **{enemy.name}** is groaning...")
+            await self.output.add(f"> **{enemy.name}** is groaning...")
 
     async def post_battle_complete(self):
         await super().post_battle_complete()
-        if not self._ran:
-            if random.random() >= 0.5:
-                skill = random.choice(self.enemies[0].skills).name
+        if not self.engine.ran:
+            if self.engine.rng.random() >= 0.5:
+                skill = self.engine.rng.choice(self.enemies[0].skills).name
                 await self.ctx.send(f"Obtained **Skill Card: {skill}**!")
                 for p in self.players:  # im looping here because of possible battle jumping (0o0)
                     p.inventory.add_item(self.ctx.bot.item_cache.items[skill])
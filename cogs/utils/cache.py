@@ -0,0 +1,204 @@
+import asyncio
+import collections
+import collections.abc
+import time
+
+from pymongo.errors import BulkWriteError
+
+from . import formats, userkeys
+from .player import Player, state_key
+
+
+class PlayerCache(collections.abc.MutableMapping):
+    """
+    The loaded players, least recently used first.
+
+    Goes over `max_size` or leaves someone untouched for `max_idle` seconds
+    and they get saved and dropped, unless theyre in a battle or have their
+    inventory open. Dropping someone with `del`/`pop` doesnt save them.
+    """
+    def __init__(self, bot, *, max_size=1000, max_idle=1800, batch_size=500):
+        self.bot = bot
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.batch_size = batch_size
+        self._players = collections.OrderedDict()
+        self._used = {}
+        self._loading = {}  # user id -> task, so two commands at once dont load someone twice
+        self._saving = {}  # user id -> task, so two saves at once dont send the same $inc twice
+
+    def __repr__(self):
+        return f"<PlayerCache {len(self._players)}/{self.max_size} loaded>"
+
+    def __getitem__(self, user_id):
+        player = self._players[user_id]
+        self._players.move_to_end(user_id)
+        self._used[user_id] = time.monotonic()
+        return player
+
+    def __setitem__(self, user_id, player):
+        self._players[user_id] = player
+        self._players.move_to_end(user_id)
+        self._used[user_id] = time.monotonic()
+        if len(self._players) > self.max_size:
+            self.bot.loop.create_task(self.evict(len(self._players) - self.max_size))
+
+    def __delitem__(self, user_id):
+        del self._players[user_id]
+        self._used.pop(user_id, None)
+
+    def __contains__(self, user_id):
+        # dont count as a use
+        return user_id in self._players
+
+    def __iter__(self):
+        return iter(self._players)
+
+    # going over everyone isnt a use either (and moving them would break the iteration)
+    def values(self):
+        return self._players.values()
+
+    def items(self):
+        return self._players.items()
+
+    def __len__(self):
+        return len(self._players)
+
+    async def _load(self, user_id):
+        pdata = await self.bot.db.abyss.accounts.find_one({"owner": user_id})
+        if not pdata:
+            return None
+        player = await Player(**pdata).populate_skills(self.bot)
+        if user_id in self._players:
+            return self[user_id]  # they got created while we were loading
+        self[user_id] = player
+        return player
+
+    async def load(self, user_id):
+        """Gets a player, loading them if they arent cached.
+
+        Everyone asking for the same player while its loading gets the same one.
+        Returns None if they dont have a player."""
+        if user_id in self._players:
+            return self[user_id]
+        try:
+            task = self._loading[user_id]
+        except KeyError:
+            task = self._loading[user_id] = self.bot.loop.create_task(self._load(user_id))
+            task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        # one caller getting cancelled shouldnt cancel the load for the rest
+        return await asyncio.shield(task)
+
+    def is_busy(self, user_id, player):
+        battles = self.bot.get_cog("BattleSystem")
+        if battles and user_id in battles.battles:
+            return True
+        return getattr(player.inventory, 'open', False)
+
+    async def _save_batch(self, players):
+        # one bulk_write and one redis pipeline for the whole batch, returns the players that failed
+        saves = [(player, *player.save_ops()) for player in players]
+        ops = [(player, op) for player, op, _, _ in saves if op is not None]
+        states = [(player, changed) for player, _, changed, _ in saves if changed]
+        failed = set()
+        if ops:
+            try:
+                await self.bot.db.abyss.accounts.bulk_write([op for _, op in ops], ordered=False)
+            except BulkWriteError as exc:
+                # the rest did get written, dont send their $incs twice
+                failed.update(ops[error['index']][0]._owner_id for error in exc.details['writeErrors'])
+                self.bot.send_error(f">>> Failed to save {len(failed)} players\n```py\n{formats.format_exc(exc)}\n```")
+            except Exception as exc:
+                self.bot.send_error(f">>> Failed to save {len(players)} players\n```py\n{formats.format_exc(exc)}\n```")
+                return players
+        redis_ok = True
+        if states:
+            pipe = self.bot.redis.pipeline()
+            for player, changed in states:
+                userkeys.register(pipe, player._owner_id, state_key(player._owner_id))
+                pipe.hmset_dict(state_key(player._owner_id), changed)
+            try:
+                await pipe.execute()
+            except Exception as exc:
+                redis_ok = False
+                self.bot.send_error(f">>> Failed to save battle state\n```py\n{formats.format_exc(exc)}\n```")
+        for player, _, _, done in saves:
+            done(mongo=player._owner_id not in failed, redis=redis_ok)
+        if not redis_ok:
+            return players
+        return [p for p in players if p._owner_id in failed]
+
+    async def _save_batches(self, players):
+        failed = []
+        for start in range(0, len(players), self.batch_size):
+            failed.extend(await self._save_batch(players[start:start+self.batch_size]))
+        return failed
+
+    async def _save(self, players):
+        # saves in batches, returns the players that failed
+        # anyone thats already being saved waits for that one, then only goes again if theres anything left
+        while True:
+            running = {self._saving[p._owner_id] for p in players if p._owner_id in self._saving}
+            running = {task for task in running if not task.done()}
+            if not running:
+                break
+            await asyncio.wait(running)
+        players = [p for p in players if p.is_dirty()]
+        if not players:
+            return []
+        task = self.bot.loop.create_task(self._save_batches(players))
+        for player in players:
+            self._saving[player._owner_id] = task
+
+        def finished(_):
+            for player in players:
+                if self._saving.get(player._owner_id) is task:
+                    del self._saving[player._owner_id]
+        task.add_done_callback(finished)
+        # whoever asked getting cancelled mid bulk_write shouldnt stop it, itd never get marked as saved
+        return await asyncio.shield(task)
+
+    async def discard(self, user_id):
+        """Drops a player without saving them, after any save thats running for them is done."""
+        self.pop(user_id, None)
+        task = self._saving.get(user_id)
+        if task is not None:
+            await asyncio.wait([task])
+
+    async def _drop(self, user_ids):
+        # saved while theyre still cached, so a load during the save gets them and not the old document
+        # only the ones that saved and werent touched since get dropped, the rest stay for next time
+        players = [(self._players[uid], self._used.get(uid)) for uid in user_ids if uid in self._players]
+        failed = {p._owner_id for p in await self._save([p for p, _ in players if p.is_dirty()])}
+        dropped = 0
+        for player, used in players:
+            uid = player._owner_id
+            if uid in failed or self._players.get(uid) is not player or self._used.get(uid) != used:
+                continue
+            if player.is_dirty() or self.is_busy(uid, player):
+                continue
+            del self[uid]
+            dropped += 1
+        return dropped
+
+    async def evict(self, count):
+        # drops the least recently used players that arent doing anything
+        victims = []
+        for uid, player in self._players.items():
+            if len(victims) >= count:
+                break
+            if not self.is_busy(uid, player):
+                victims.append(uid)
+        return await self._drop(victims)
+
+    async def evict_idle(self):
+        cutoff = time.monotonic() - self.max_idle
+        victims = [uid for uid, player in self._players.items()
+                   if self._used.get(uid, 0) < cutoff and not self.is_busy(uid, player)]
+        return await self._drop(victims)
+
+    async def flush(self):
+        # write-behind, saves everyone with unsaved changes but keeps them loaded
+        dirty = [p for p in self._players.values() if p.is_dirty()]
+        failed = await self._save(dirty)
+        return len(dirty) - len(failed)
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import itertools
+from datetime import datetime
+
+from . import formats
+
+RETRY_DELAY = 60  # seconds before trying a batch again if the delete failed
+
+
+def shard_of(guild_id, shard_count):
+    # dms always go through shard 0
+    if not guild_id:
+        return 0
+    return (guild_id >> 22) % shard_count
+
+
+class CraftScheduler:
+    """
+    The crafting jobs this cluster is in charge of, soonest first.
+
+    Jobs are loaded from the database once, new ones get pushed straight in.
+    Everything thats due is completed together and deleted with one delete_many.
+    A job belongs to the cluster that has the shard of the guild it was started in,
+    so no two clusters ever finish the same one.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self._heap = []  # (after, tiebreaker, job)
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __repr__(self):
+        return f"<CraftScheduler {len(self._heap)} jobs>"
+
+    def __len__(self):
+        return len(self._heap)
+
+    def owns(self, job):
+        shard_count = self.bot.shard_count or 1
+        shard_ids = self.bot.shard_ids
+        if shard_ids is None:
+            return True  # not clustered, everything is ours
+        return shard_of(job.get('guild'), shard_count) in shard_ids
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def push(self, job):
+        # wake the loop up if this one is due before whatever its waiting on
+        if not self._heap or job['after'] < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (job['after'], next(self._counter), job))
+
+    async def add(self, job):
+        await self.bot.db.abyss.crafttasks.insert_one(job)
+        self.push(job)
+        return job
+
+    async def load(self):
+        jobs = await self.bot.db.abyss.crafttasks.find({}).to_list(None)
+        self._heap = [(job['after'], next(self._counter), job) for job in jobs if self.owns(job)]
+        heapq.heapify(self._heap)
+        return len(self._heap)
+
+    def pop_due(self, now=None):
+        now = now or datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    async def _wait(self):
+        self._wakeup.clear()
+        timeout = None
+        if self._heap:
+            timeout = max(0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        await self.bot.prepared.wait()
+        count = await self.load()
+        self.bot.log.info(f'craft scheduler loaded {count} jobs')
+        while True:
+            due = self.pop_due()
+            if not due:
+                await self._wait()
+                continue
+            try:
+                await self.bot.db.abyss.crafttasks.delete_many({'_id': {'$in': [job['_id'] for job in due]}})
+            except Exception as exc:
+                self.bot.send_error(f">>> Failed to finish {len(due)} craft jobs\n```py\n{formats.format_exc(exc)}\n```")
+                for job in due:
+                    self.push(job)
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            for job in due:
+                self.bot.dispatch('craft_complete', job)
@@ -0,0 +1,49 @@
+"""
+Things that reset at 00:00 UTC, without anything having to run at 00:00.
+
+Keys that only last a day get an EXPIREAT of the next midnight when theyre
+written. Values that sit in a longer lived key are stamped with the day they
+were written on, and count as reset once that isnt today anymore.
+"""
+
+import time
+
+DAY = 86400
+
+# unlinks one SCAN batch of keys that have no expiry, returns {next cursor, keys unlinked}
+# only for keys written before they had a TTL, everything new expires by itself
+SWEEP_SCRIPT = """
+redis.replicate_commands()
+local result = redis.call('SCAN', ARGV[1], 'MATCH', ARGV[2], 'COUNT', ARGV[3])
+local stale = {}
+for _, key in ipairs(result[2]) do
+    if redis.call('TTL', key) == -1 then
+        stale[#stale + 1] = key
+    end
+end
+if #stale > 0 then
+    redis.call('UNLINK', unpack(stale))
+end
+return {result[1], #stale}
+"""
+
+
+def today():
+    # days since the epoch, in utc
+    return int(time.time() // DAY)
+
+
+def next_midnight_timestamp():
+    return (today() + 1) * DAY
+
+
+async def sweep(redis, match, *, count=1000):
+    """Unlinks every key matching `match` that has no expiry, a batch per script call. Returns how many went."""
+    removed = 0
+    cur = 0
+    while True:
+        cur, found = await redis.eval(SWEEP_SCRIPT, args=[cur, match, count])
+        removed += found
+        cur = int(cur)
+        if cur == 0:
+            return removed
@@ -0,0 +1,61 @@
+import asyncio
+
+from .schema import NO_ID
+
+
+class EncounterCatalogue:
+    """
+    The whole encounters collection, kept in memory.
+
+    name (lowercase) -> document
+    (map name, area) -> (documents that can show up there)
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self._by_name = {}
+        self._by_area = {}
+        self._ready = asyncio.Event()
+
+    def __repr__(self):
+        return f"<EncounterCatalogue {len(self._by_name)} encounters, {len(self._by_area)} areas indexed>"
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __iter__(self):
+        return iter(self._by_name.values())
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    async def refresh(self):
+        documents = await self.bot.db.abyss.encounters.find({}, NO_ID).to_list(None)
+        # swap the whole thing at once so a lookup never sees a half built catalogue
+        self._by_name = {doc['name'].lower(): doc for doc in documents}
+        self._by_area = {}
+        self._ready.set()
+        return len(documents)
+
+    def get(self, name):
+        return self._by_name.get(name.lower())
+
+    def names(self):
+        return [doc['name'] for doc in self._by_name.values()]
+
+    def in_area(self, map, area):
+        # areas are indexed the first time theyre asked for, maps can be loaded after us
+        try:
+            return self._by_area[map.name, area]
+        except KeyError:
+            seen = set()
+            found = []
+            for name in map.areas[area]['encounters']:
+                doc = self._by_name.get(name.lower())
+                if doc is not None and doc['name'] not in seen:
+                    seen.add(doc['name'])
+                    found.append(doc)
+            found = self._by_area[map.name, area] = tuple(found)
+            return found
@@ -0,0 +1,445 @@
+"""
+The battle rules, without any of the discord bits.
+
+WildBattle drives one of these and turns the events into messages,
+but it can also be driven directly with policies to play out battles
+in bulk, eg for balancing or to reproduce a bug from a seed.
+"""
+
+import random
+
+from . import ailments, analysis
+from .ailments import AilmentRemoved, Fear, UserIsImmobilized, UserTurnInterrupted
+from .enums import AilmentType, ResistanceModifier, SkillType
+from .objects import ListCycle
+from .skills import AilmentSkill, Charge, GenericAttack, HealingSkill, Karn, ShieldSkill, StatusMod
+
+UNSUPPORTED_SKILLS = ['Growth 1', 'Growth 2', 'Growth 3',
+                      'Amrita Shower', 'Amrita Drop',
+                      'Fortify Spirit', 'Recarm', 'Samarecarm',
+                      'Rebellion', 'Revolution', 'Foul Breath', 'Stagnant Air']
+
+EFFECT_SKILLS = (StatusMod, ShieldSkill, HealingSkill, Karn, Charge, AilmentSkill)
+
+
+class BattleEvent:
+    __slots__ = ('turn', 'kind', 'user', 'target', 'skill', 'result', 'message')
+
+    # kinds:
+    # start       - the battle started, check engine.ambush
+    # message     - a line to show as-is (ailments, effects, reverts etc)
+    # immobilized - user couldn't move because of their ailment
+    # fled        - user ran away because of Fear
+    # guard       - user guarded
+    # used        - user used an effect skill, followed by its messages
+    # unsupported - user picked a skill without a handler
+    # invalid     - user couldn't use the skill (cost/forget), they get to pick again
+    # hit         - a single hit landed (or missed), `result` is the DamageResult
+    # again       - user gets another turn from a weakness/crit
+    # run         - the player ran from battle
+
+    def __init__(self, turn, kind, user=None, target=None, skill=None, result=None, message=None):
+        self.turn = turn
+        self.kind = kind
+        self.user = user
+        self.target = target
+        self.skill = skill
+        self.result = result
+        self.message = message
+
+    def __repr__(self):
+        return (f"<BattleEvent turn={self.turn} kind={self.kind} user={self.user} target={self.target} "
+                f"skill={self.skill} result={self.result!r} message={self.message!r}>")
+
+
+class SimulationResult:
+    __slots__ = ('seed', 'turns', 'winner', 'ran', 'events')
+
+    def __init__(self, engine):
+        self.seed = engine.seed
+        self.turns = engine.turn_cycle
+        self.ran = engine.ran
+        if engine.ran:
+            self.winner = None
+        elif all(p.is_fainted() for p in engine.players):
+            self.winner = 'enemies'
+        elif all(e.is_fainted() for e in engine.enemies):
+            self.winner = 'players'
+        else:
+            self.winner = None  # ran out of turns
+        self.events = engine.events
+
+    def __repr__(self):
+        return f"<SimulationResult seed={self.seed} turns={self.turns} winner={self.winner} ran={self.ran}>"
+
+
+def skill_cost(user, skill):
+    # returns (cost, uses_sp) for the user
+    if skill.uses_sp:
+        cost = skill.cost
+        if user.has_skill('Spell Master'):
+            cost /= 2
+        return cost, True
+    if skill.cost != 0:
+        cost = user.max_hp * (skill.cost / 100)
+        if user.has_skill('Arms Master'):
+            cost /= 2
+    else:
+        cost = 0
+    return cost, False
+
+
+def usable_skills(user):
+    # skills the user could pick right now
+    if hasattr(user, 'book'):
+        return list(user.book.affordable(user.sp))
+    forgot = user.ailment and user.ailment.type is AilmentType.FORGET
+    choices = []
+    for skill in user.skills:
+        if skill.type is SkillType.PASSIVE or skill.name in UNSUPPORTED_SKILLS:
+            continue
+        if forgot and not skill.is_default:
+            continue
+        cost, uses_sp = skill_cost(user, skill)
+        if (user.sp if uses_sp else user.hp) < cost:
+            continue
+        choices.append(skill)
+    return choices
+
+
+def random_policy(engine, user):
+    """Picks a random move the user can afford, targets picked at random.
+
+    Enemies use their own random_move, which pays for the skill itself."""
+    if hasattr(user, 'random_move'):
+        skill = user.random_move(engine.rng)
+        return skill, engine.filter_targets(skill, user)
+    skill = engine.rng.choice(usable_skills(user) or (GenericAttack,))
+    return skill, engine.filter_targets(skill, user)
+
+
+def damage_policy(engine, user):
+    """Picks the damaging skill with the highest expected damage against the other side.
+
+    Falls back to random_policy when nothing would do damage."""
+    if user.ailment and user.ailment.type is AilmentType.FORGET:
+        return random_policy(engine, user)
+    skills = [s for s in usable_skills(user) if s.is_damaging_skill and s.name not in UNSUPPORTED_SKILLS]
+    foes = [f for f in (engine.enemies if engine.is_player(user) else engine.players) if not f.is_fainted()]
+    if not skills or not foes:
+        return random_policy(engine, user)
+    expected = analysis.damage_table((user,), foes, skills).expected[0]  # [target, skill]
+    best, best_value, best_targets = None, 0, None
+    for index, skill in enumerate(skills):
+        if skill.target in ('enemies', 'all'):
+            value = expected[:, index].sum()
+            targets = engine.filter_targets(skill, user)
+        else:
+            target = int(expected[:, index].argmax())
+            value = expected[target, index]
+            targets = foes[target],
+        if value > best_value:
+            best, best_value, best_targets = skill, value, targets
+    if best is None:
+        return random_policy(engine, user)
+    if hasattr(user, 'pay_for'):
+        user.pay_for(best)
+    return best, best_targets
+
+
+class BattleEngine:
+    def __init__(self, players, enemies, *, ambush=None, seed=None, rng=None,
+                 player_policy=random_policy, enemy_policy=random_policy, max_turns=100):
+        if rng is None:
+            if seed is None:
+                seed = random.randrange(2 ** 32)
+            rng = random.Random(seed)
+        self.seed = seed
+        self.rng = rng
+        self.players = tuple(players)
+        self.enemies = sorted(enemies, key=lambda e: e.agility, reverse=True)
+        self.ambush = ambush
+        # True -> player got the initiative
+        # False -> enemy got the jump
+        # None -> proceed by agility
+        if self.ambush is True:
+            order = [*self.players, *self.enemies]
+        elif self.ambush is False:
+            order = [*self.enemies, *self.players]
+        else:
+            order = sorted([*self.players, *self.enemies], key=lambda i: i.agility, reverse=True)
+        self.order = ListCycle(order)
+        self.turn_cycle = 0
+        self.double_turn = False
+        self.ran = False
+        self.stopped = False
+        self.player_policy = player_policy
+        self.enemy_policy = enemy_policy
+        self.max_turns = max_turns
+        self.events = []
+        self._drained = 0
+
+    def __repr__(self):
+        return f"<BattleEngine seed={self.seed} turn={self.turn_cycle} order={self.order!r}>"
+
+    def emit(self, kind, user=None, **kwargs):
+        self.events.append(BattleEvent(self.turn_cycle, kind, user, **kwargs))
+
+    def say(self, *lines):
+        for line in lines:
+            self.emit('message', message=line)
+
+    def drain(self):
+        # events that havent been handed out yet
+        events = self.events[self._drained:]
+        self._drained = len(self.events)
+        return events
+
+    def is_player(self, user):
+        return user in self.players
+
+    def is_over(self):
+        if all(p.is_fainted() for p in self.players):
+            return True
+        return all(e.is_fainted() for e in self.enemies)
+
+    def stop(self, ran=False):
+        self.stopped = True
+        self.ran = self.ran or ran
+
+    def filter_targets(self, skill, user):
+        if self.is_player(user):
+            foes, allies = self.enemies, self.players
+        else:
+            foes, allies = self.players, self.enemies
+        if skill.target == 'enemies':
+            return [f for f in foes if not f.is_fainted()]
+        elif skill.target == 'enemy':
+            return self.rng.choice([f for f in foes if not f.is_fainted()]),
+        elif skill.target == 'self':
+            return user,
+        elif skill.target == 'ally':
+            return self.rng.choice([a for a in allies if not a.is_fainted()]),
+        elif skill.target == 'allies':
+            return [a for a in allies if not a.is_fainted()]
+        elif skill.target == 'all':
+            return [*self.players, *self.enemies]  # fainted ones are skipped when hitting
+
+    def pre_battle(self):
+        if self.ambush is True:
+            gained, lost = self.players, self.enemies
+        elif self.ambush is False:
+            gained, lost = self.enemies, self.players
+        else:
+            gained = lost = ()
+
+        for u in lost:
+            if u.has_skill('Adverse Resolve'):
+                u._ex_crit_mod += 5.0
+            if u.has_skill('Pressing Stance'):
+                u._ex_evasion_mod += 3.0
+
+        for u in gained:
+            if u.has_skill('Fortified Moxy'):
+                u._ex_crit_mod += 2.5
+
+        for p in self.players:
+            p.pre_battle()
+        for e in self.enemies:
+            e.pre_battle()
+        self.emit('start')
+
+    def start_turn(self, user):
+        """Runs ailments and turn-start passives, returns whether ``user`` can act this turn."""
+        if not user.is_fainted() and user.ailment is not None:
+            out = []
+            try:
+                user.ailment.battle_turn_effect(self, out)
+            except UserIsImmobilized:
+                self.say(*out)
+                self.emit('immobilized', user, message=user.ailment.cannot_move_msg.format(self=user.ailment))
+                self.order.cycle()
+                return False
+            except AilmentRemoved:
+                self.say(*out, f"> __{user}__'s {user.ailment.name} wore off!")
+                user.ailment = None
+            except Fear:
+                self.say(*out)
+                self.emit('fled', user, message=f"> __{user}__ ran away!")
+                if not self.is_player(user):
+                    user.hp = user.max_hp  # faint the enemy ig lol
+                else:
+                    self.stop(ran=True)
+                    return False  # player ran away
+                self.order.cycle()
+            except UserTurnInterrupted:
+                self.say(*out)
+                self.order.cycle()
+                return False
+            else:
+                self.say(*out)
+
+        if user.is_fainted():
+            if self.is_player(user):
+                self.order.cycle()  # skip them, or theyd be up again forever
+                return False
+            return True  # fainted enemies still need removing
+
+        if not self.double_turn:
+            heat_up = self.ambush if self.is_player(user) else self.ambush is False
+            if heat_up and user.has_skill('Heat Up'):
+                user.hp = -(user.max_hp * 0.05)
+                user.sp = -10
+            if self.is_player(user):
+                self.turn_cycle += 1
+        return True
+
+    def pre_turn(self, user):
+        # only runs on the first of a double turn
+        if not self.double_turn:
+            self.say(*user.pre_turn())
+        self.double_turn = False
+
+    def end_turn(self, user):
+        if not self.is_player(user) and user.is_fainted():
+            self.order.remove(user)
+        elif not user.is_fainted() and user.ailment is not None:
+            user.ailment.post_turn_effect()
+        self.order.cycle()
+
+    def retry(self):
+        # let the active unit choose again
+        self.double_turn = True
+        self.order.decycle()
+
+    def use_skill(self, user, skill, targets):
+        """Resolves ``skill`` from ``user`` onto ``targets``.
+
+        Players pay for the skill here, enemies already paid in random_move."""
+        if skill.name == 'Guard':
+            user.guarding = True
+            self.emit('guard', user, skill=skill)
+            return
+
+        if skill.name in UNSUPPORTED_SKILLS:
+            self.emit('unsupported', user, skill=skill)
+            if self.is_player(user):
+                self.retry()
+            return
+
+        if self.is_player(user):
+            cost, uses_sp = skill_cost(user, skill)
+            forgot = (not skill.is_default) and user.ailment and user.ailment.type is AilmentType.FORGET
+            if uses_sp:
+                if user.sp < cost:
+                    self.emit('invalid', user, skill=skill, message="You don't have enough SP for this move!")
+                    return self.retry()
+            elif cost > user.hp:
+                self.emit('invalid', user, skill=skill, message="You don't have enough HP for this move!")
+                return self.retry()
+            if forgot:
+                self.emit('invalid', user, skill=skill, message="You've forgotten how to use this move!")
+                return self.retry()
+            if uses_sp:
+                user.sp = cost
+            else:
+                user.hp = cost
+
+        if isinstance(skill, EFFECT_SKILLS):
+            self.emit('used', user, skill=skill, message=f"__{user}__ used `{skill}`!")
+            self.say(*skill.apply(user, targets, self.rng))
+            return
+
+        self.hit(user, skill, targets)
+
+    def hit(self, user, skill, targets):
+        rng = self.rng
+        weaked = False
+        for target in targets:
+            # this is to ensure crits only happen IF the first hit did land a crit
+            # we use a Triboolean:
+            # 0: first hit, determine crit
+            # 1: first hit passed, it was a crit
+            # 2: first hit passed, was not a crit
+            force_crit = 0
+
+            for __ in range(rng.randint(*skill.hits)):
+                if target.is_fainted():
+                    break  # no point hitting the dead
+                res = target.take_damage(user, skill, enforce_crit=force_crit, rng=rng)
+                force_crit = 1 if res.critical else 2
+                self.emit('hit', user, target=target, skill=skill, result=res)
+                if res.endured:
+                    self.say(f"> __{target}__ endured the hit!")
+
+                if res.miss:
+                    # the first hit was a miss, so just break
+                    # the back door is explained in utils/player.py take_damage
+                    break
+
+                if res.resistance in (
+                        ResistanceModifier.IMMUNE,
+                        ResistanceModifier.REFLECT,
+                        ResistanceModifier.ABSORB
+                ) and hasattr(user, 'book'):
+                    user.book.mark_unusable(skill.name)
+                    # the ai learns not to use it in the future, but still use it this turn
+
+                if skill.type is SkillType.PHYSICAL:
+                    if target.ailment and target.ailment.type is AilmentType.SLEEP:
+                        if rng.randint(1, 6) != 1:
+                            target.ailment = None
+                            self.say(f"> __{target}__ woke up!")
+
+                if skill.name == 'Attack':
+                    if target.ailment and target.ailment.type is AilmentType.SHOCK:
+                        if not user.ailment and rng.randint(1, 3) == 1:
+                            user.ailment = ailments.Shock(user, AilmentType.SHOCK, rng)
+                            self.say(f"> __{user}__ was inflicted with **Shock**!")
+                    elif not target.ailment and user.ailment and user.ailment.type is AilmentType.SHOCK:
+                        target.ailment = ailments.Shock(target, AilmentType.SHOCK, rng)
+                        self.say(f"> __{target}__ was inflicted with **Shock**!")
+
+                if res.did_weak:
+                    weaked = True
+
+        if skill.uses_sp:  # reset here so all hits of a skill are charged up
+            user.concentrating = False
+        else:
+            user.charging = False
+
+        if weaked and not self.is_over():
+            self.retry()
+            if self.is_player(user):
+                self.emit('again', user, message="> Nice hit! Move again!")
+            else:
+                self.emit('again', user, message=f"> Watch out, {user} is attacking again!")
+
+    def step(self):
+        # plays out one turn using the policies
+        if self.is_over():
+            return self.stop()
+        user = self.order.active()
+        if not self.start_turn(user):
+            return
+        if not user.is_fainted():
+            self.pre_turn(user)
+            policy = self.player_policy if self.is_player(user) else self.enemy_policy
+            choice = policy(self, user)
+            if choice is None:
+                self.emit('run', user)
+                return self.stop(ran=True)
+            self.use_skill(user, *choice)
+        self.end_turn(user)
+
+    def run(self):
+        """Plays the whole battle out, returns a SimulationResult."""
+        self.pre_battle()
+        while not self.stopped and self.turn_cycle <= self.max_turns:
+            self.step()
+        return SimulationResult(self)
+
+
+def simulate(players, enemies, *, seed=None, **kwargs):
+    """Shortcut for BattleEngine(...).run()"""
+    return BattleEngine(players, enemies, seed=seed, **kwargs).run()
@@ -5,8 +5,6 @@ from contextlib import contextmanager
 
 from discord.ext import commands
 
-from cogs.utils.player import Player
-
 
 def prettyjson(obj, indent=4, maxlinelength=80):
     """Renders JSON content with indentation and line splits/concatenations to fit maxlinelength.
@@ -150,14 +148,9 @@ class NotSearched(commands.CommandError):
 
 def ensure_player(func):
     async def predicate(ctx):
-        try:
-            ctx.player = ctx.bot.players.players[ctx.author.id]
-        except KeyError:
-            pdata = await ctx.bot.db.abyss.accounts.find_one({"owner": ctx.author.id})
-            if not pdata:
-                raise NoPlayer()
-            ctx.player = ctx.bot.players.players[ctx.author.id] = Player(**pdata)
-            await ctx.player.populate_skills(ctx.bot)
+        ctx.player = await ctx.bot.players.players.load(ctx.author.id)
+        if ctx.player is None:
+            raise NoPlayer()
         return True
 
     return commands.check(predicate)(func)
@@ -39,6 +39,7 @@ class Inventory:
         for tab, iids in data.items():
             for item, count in iids:
                 self.items[ItemType[tab]].append(_ItemCount(bot.item_cache.get_item(item), count))
+        self._saved = None  # what the stored document has, see build_update
 
     def __repr__(self):
         return f"<{self.player.owner.name}'s inventory, {sum(map(len, self.items.values()))} items>"
@@ -46,6 +47,38 @@ class Inventory:
     def to_json(self):
         return {t.name: [(str(i), i.count) for i in k] for t, k in self.items.items()}
 
+    def mark_saved(self, data=None):
+        self._saved = data or self.to_json()
+
+    def build_update(self):
+        """Item level changes since the last save.
+
+        Returns ({operator: {path: value}}, snapshot), pass the snapshot to mark_saved once its written"""
+        current = self.to_json()
+        if self._saved is None:
+            return {"$set": {"inventory": current}}, current
+        update = {}
+        for tab, items in current.items():
+            saved = self._saved.get(tab)
+            if saved == items:
+                continue
+            path = f"inventory.{tab}"
+            if saved is None or len(items) < len(saved) or any(a[0] != b[0] for a, b in zip(items, saved)):
+                # something got removed or moved around, positions dont line up anymore
+                update.setdefault("$set", {})[path] = items
+                continue
+            counts = {f"{path}.{i}.1": item[1] - saved[i][1]
+                      for i, item in enumerate(items[:len(saved)]) if item[1] != saved[i][1]}
+            added = items[len(saved):]
+            if counts and added:
+                # mongo wont $inc inside an array its also $pushing to
+                update.setdefault("$set", {})[path] = items
+            elif added:
+                update.setdefault("$push", {})[path] = {"$each": added}
+            else:
+                update.setdefault("$inc", {}).update(counts)
+        return update, current
+
     def set_closed(self, f):
         self.open = False
 
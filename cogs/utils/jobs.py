@@ -0,0 +1,133 @@
+"""
+Periodic work, shared out between the clusters.
+
+    bot.jobs.register('dbl', self.post_stats, every=daily.DAY)
+
+Runs line up with multiples of `every` (plus `offset`) seconds since the epoch,
+so every cluster agrees on when the next one is. When a cluster wide job is due
+each cluster tries to take the redis lease for that run, the one that gets it runs
+the job. That makes it once per interval however many clusters there are, and if
+a cluster is down whoever is still up takes it.
+
+cluster_wide=False jobs run on every cluster, for things like the players each
+cluster has loaded.
+"""
+
+import asyncio
+import time
+
+from . import formats
+
+
+def lease_key(name, due):
+    # one key per run, so a cluster thats a bit early or late cant take the same run again
+    return f'jobs:{name}:{due}'
+
+
+def record_key(name):
+    return f'jobs:{name}'
+
+
+class Job:
+    __slots__ = ('name', 'func', 'every', 'offset', 'cluster_wide', 'task', 'runs', 'failures', 'skipped',
+                 'last_run', 'last_duration')
+
+    def __init__(self, name, func, *, every, offset=0, cluster_wide=True):
+        self.name = name
+        self.func = func
+        self.every = every
+        self.offset = offset
+        self.cluster_wide = cluster_wide
+        self.task = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0  # runs another cluster took
+        self.last_run = None  # timestamp the last run here was due at
+        self.last_duration = None
+
+    def __repr__(self):
+        return f"<Job {self.name!r} every {self.every}s, {self.runs} runs, {self.failures} failed>"
+
+    def next_run(self, after):
+        return int(((after - self.offset) // self.every + 1) * self.every + self.offset)
+
+
+class JobScheduler:
+    def __init__(self, bot):
+        self.bot = bot
+        self.jobs = {}
+
+    def __repr__(self):
+        return f"<JobScheduler {len(self.jobs)} jobs>"
+
+    def register(self, name, func, *, every, offset=0, cluster_wide=True):
+        """Runs `await func()` every `every` seconds, see the module docstring."""
+        self.unregister(name)  # cog reloads register again
+        job = self.jobs[name] = Job(name, func, every=every, offset=offset, cluster_wide=cluster_wide)
+        job.task = self.bot.loop.create_task(self._runner(job))
+        return job
+
+    def unregister(self, name):
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            job.task.cancel()
+
+    async def claim(self, job, due):
+        if not job.cluster_wide:
+            return True
+        redis = self.bot.redis
+        return await redis.set(lease_key(job.name, due), self.bot.cluster_name, expire=max(int(job.every), 1),
+                               exist=redis.SET_IF_NOT_EXIST)
+
+    async def _runner(self, job):
+        await self.bot.prepared.wait()
+        due = 0
+        while True:
+            # sleep can wake up a hair early, never work out the same run twice
+            due = job.next_run(max(time.time(), due))
+            await asyncio.sleep(due - time.time())
+            try:
+                claimed = await self.claim(job, due)
+            except Exception as exc:
+                self.bot.send_error(f">>> Couldnt claim job `{job.name}`\n```py\n{formats.format_exc(exc)}\n```")
+                continue
+            if claimed:
+                await self._run(job, due)
+            else:
+                job.skipped += 1
+
+    async def _run(self, job, due):
+        start = time.perf_counter()
+        ok = True
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            ok = False
+            job.failures += 1
+            self.bot.send_error(f">>> Error in job `{job.name}`\n```py\n{formats.format_exc(exc)}\n```")
+        job.runs += 1
+        job.last_run = due
+        job.last_duration = time.perf_counter() - start
+        self.bot.log.info(f"job {job.name} {'done' if ok else 'failed'} in {job.last_duration * 1000:.0f}ms")
+        if job.cluster_wide:
+            # so any cluster can tell when it last ran and where
+            try:
+                await self.bot.redis.hmset_dict(record_key(job.name), {
+                    'cluster': self.bot.cluster_name,
+                    'due': due,
+                    'duration': f'{job.last_duration:.3f}',
+                    'ok': int(ok)
+                })
+            except Exception as exc:
+                self.bot.log.warning(f"couldnt record job {job.name}: {exc!r}")
+
+    async def last_runs(self):
+        """{name: the last run of each cluster wide job, whichever cluster did it}"""
+        out = {}
+        for name, job in self.jobs.items():
+            if job.cluster_wide:
+                out[name] = {k.decode(): v.decode()
+                             for k, v in (await self.bot.redis.hgetall(record_key(name))).items()}
+        return out
@@ -2,6 +2,8 @@ import json
 
 import random
 
+from . import daily, userkeys
+
 
 class Map:
     __slots__ = ('desc', 'name', 'bot', 'areas')
@@ -17,9 +19,12 @@ class Map:
     async def open_treasure(self, player):
         key = await self.bot.redis.hget(f'treasures_found:{player.owner.id}', player.area)
         if key and int(key) == self.areas[player.area]['treasurecount']:
-            # also its set to None every 24h
+            # also it expires at midnight
             return -1  # return False indicating that no treasures are available here
-        await self.bot.redis.hincrby(f'treasures_found:{player.owner.id}', player.area, 1)
+        pipe = userkeys.register(self.bot.redis.pipeline(), player.owner.id, f'treasures_found:{player.owner.id}')
+        pipe.hincrby(f'treasures_found:{player.owner.id}', player.area, 1)
+        pipe.expireat(f'treasures_found:{player.owner.id}', daily.next_midnight_timestamp())
+        await pipe.execute()
         # otherwise, return None (we didnt find anything) or an item/treasure demon
         choice = random.random()
         if choice <= 0.01:
@@ -0,0 +1,71 @@
+"""
+How much memory a cached player takes, outside of a battle and in one.
+
+    python -m cogs.utils.membench [count]
+
+Run from the repo root. Builds `count` players from base-demons.json the way
+the cache does (skills shared from one skill cache) and prints the bytes per
+player that tracemalloc sees. Check out an older commit and run it again to
+compare.
+"""
+
+import json
+import sys
+import tracemalloc
+
+from . import i18n  # noqa: F401 installs _
+from .inventory import Inventory
+from .objects import CaseInsensitiveDict
+from .player import Player
+from .skills import GenericAttack, Guard, Skill
+
+
+def load_skills():
+    with open("skill-data.json") as file:
+        cache = CaseInsensitiveDict({s['name']: Skill(**s) for s in json.load(file)})
+    cache['Attack'] = GenericAttack
+    cache['Guard'] = Guard
+    return cache
+
+
+def build(demons, skill_cache, count):
+    players = []
+    for owner in range(count):
+        data = dict(demons[owner % len(demons)], owner=owner)
+        data['skills'] = [skill_cache[name] for name in sorted({'Attack', 'Guard', *data['skills']})]
+        player = Player(**data)
+        player.inventory = Inventory(None, player, {})
+        players.append(player)
+    return players
+
+
+def enter_battle(players):
+    # what a battle leaves on everyone after their first turn
+    for player in players:
+        player.pre_battle()
+        player.guarding = True
+
+
+def measure(func, *args):
+    # (return value, bytes that were still allocated afterwards)
+    before = tracemalloc.take_snapshot()
+    result = func(*args)
+    after = tracemalloc.take_snapshot()
+    return result, sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+
+def main(count=2000):
+    with open("base-demons.json") as file:
+        demons = json.load(file)
+    skill_cache = load_skills()  # shared by every player, not counted
+    tracemalloc.start()
+    players, cached = measure(build, demons, skill_cache, count)
+    _, battle = measure(enter_battle, players)
+    tracemalloc.stop()
+    print(f"{count} players")
+    print(f"cached:    {cached / count:.0f} bytes per player")
+    print(f"in battle: +{battle / count:.0f} bytes per player")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
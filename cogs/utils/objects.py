@@ -1,22 +1,46 @@
 import collections
 import json
+import operator
 
 from cogs.utils.enums import ResistanceModifier
 
 
+def to_plain(value):
+    # what json.loads(json.dumps(value)) would give back, without making the string
+    if isinstance(value, JSONable):
+        return value.to_json()
+    if isinstance(value, dict):
+        return {k if isinstance(k, str) else str(k): to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    return value
+
+
 class JSONable:
+    __slots__ = ()
     __json__ = ()
-
-    @staticmethod
-    def _serialize(obj):
-        return {k: obj.keygetter(k) for k in obj.__json__ if not k.startswith('_')}
+    # key -> function(self), for keys that arent just an attribute of the same name
+    __json_getters__ = {}
+
+    @classmethod
+    def _accessors(cls):
+        # worked out once per class, not on every to_json
+        try:
+            return cls.__dict__['_json_accessors']
+        except KeyError:
+            accessors = tuple((k, cls.__json_getters__.get(k) or operator.attrgetter(k))
+                              for k in cls.__json__ if not k.startswith('_'))
+            cls._json_accessors = accessors
+            return accessors
 
     def keygetter(self, key):
+        getter = self.__json_getters__.get(key)
+        if getter:
+            return getter(self)
         return getattr(self, key)
 
     def to_json(self):
-        ret = json.loads(json.dumps(self, default=self._serialize))
-        return ret
+        return {k: to_plain(getter(self)) for k, getter in self._accessors()}
 
 
 class CaseInsensitiveDict(dict):
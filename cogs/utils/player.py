@@ -1,7 +1,9 @@
 import math
 import random
-import re
 
+from pymongo import ReplaceOne, UpdateOne
+
+from cogs.utils import daily, userkeys
 from cogs.utils.enums import (
     AilmentType,
     Arcana,
@@ -13,44 +15,150 @@ from cogs.utils.enums import (
 )
 from cogs.utils.inventory import Inventory
 from cogs.utils.lookups import TYPE_SHORTEN, STAT_MOD
-from cogs.utils.objects import DamageResult, JSONable
-from cogs.utils.skills import Skill
+from cogs.utils.objects import DamageResult, JSONable, to_plain
+from cogs.utils.skills import PASSIVE_HANDLES, Skill
 from cogs.utils.weather import get_current_weather
 
 CRITICAL_BASE = 4
 
+# only ever added to or taken from, so they get saved with $inc
+INC_FIELDS = frozenset(('exp', 'credits', 'stat_points', 'ap'))
+
+# state that wears off and lives in redis instead of mongo, one hash per player
+# anything else that should last between battles (ailments, buffs) can go in here too
+STATE_FIELDS = ('sp_used', 'damage_taken')
+# sp_used gets stamped with the day its from and is back to 0 the day after
+SP_DAY = 'sp_day'
+
+
+def state_key(owner_id):
+    return f'pstate:{owner_id}'
+
+
+async def migrate_player_state(redis, *, count=1000):
+    """Folds the old p_sp_used:<id> and p_dmg_taken:<id> keys into pstate:<id> hashes.
+
+    Whatever is already in a hash wins, so this is safe to run more than once.
+    Returns how many players had something to migrate."""
+    old = {'sp_used': 'p_sp_used:', 'damage_taken': 'p_dmg_taken:'}
+    owners = set()
+    for prefix in old.values():
+        cur = None
+        while cur != 0:
+            cur, keys = await redis.scan(cur or 0, match=f'{prefix}*', count=count)
+            owners.update(k.decode().split(':', 1)[1] for k in keys)
+    owners = list(owners)
+    for start in range(0, len(owners), count):
+        chunk = owners[start:start+count]
+        keys = [f'{prefix}{owner}' for owner in chunk for prefix in old.values()]
+        values = await redis.mget(*keys)
+        pipe = redis.pipeline()
+        for index, owner in enumerate(chunk):
+            for offset, field in enumerate(old):
+                value = values[index * len(old) + offset]
+                if value is not None:
+                    userkeys.register(pipe, owner, state_key(owner))
+                    pipe.hsetnx(state_key(owner), field, value)
+        pipe.delete(*keys)
+        await pipe.execute()
+    return len(owners)
+
 IMMUNITY_ORDER = ['Repel', 'Absorb', 'Null', 'Resist']
 
+SHORT_TO_TYPE = {v: SkillType[k.upper()] for k, v in TYPE_SHORTEN.items()}
+
+AUTO_MODS = {
+    StatModifier.TARU: 'Attack Master',
+    StatModifier.RAKU: 'Defense Master',
+    StatModifier.SUKU: 'Speed Master'
+}
+
+
+class BattleState:
+    """
+    Everything about a player that only lasts for one battle.
+
+    Players dont have one until something in a battle touches it, and
+    post_battle throws it away again, so the cache doesnt carry one per player.
+    """
+    __slots__ = ('stat_mod', 'until_clear', 'guarding', 'shields', '_ex_crit_mod', '_rebellion', '_ailment_buff',
+                 '_ex_evasion_mod', '_endured', 'charging', 'concentrating', '_tetrakarn', '_makarakarn')
+
+    def __init__(self):
+        self.stat_mod = [0, 0, 0]
+        # [attack][defense][agility]
+        self.until_clear = [0, 0, 0]  # turns until it gets cleared for each stat, max of 3 turns
+        self.guarding = False
+        self.shields = {}
+        self._ex_crit_mod = 1.0  # handled by the battle system in the pre-loop hook
+        self._rebellion = [False, -1]  # Rebellion or Revolution, [(is enabled), (time until clear)]
+        self._ailment_buff = -1  # > 0: ailment susceptibility is increased
+        self._ex_evasion_mod = 1.0  # handled by the battle system, usually only affected by Pressing Stance
+        self._endured = False
+        self.charging = False
+        self.concentrating = False
+        self._tetrakarn = False
+        self._makarakarn = False
+
+
+_NO_BATTLE = BattleState()
+
+
+class BattleField:
+    # a BattleState attribute on the player
+    # reading one outside of a battle gives the default without making a state,
+    # except for the lists/dicts, those could be changed in place
+    __slots__ = ('name', 'mutable')
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.mutable = isinstance(getattr(_NO_BATTLE, name), (list, dict))
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        state = instance._battle
+        if state is None:
+            if not self.mutable:
+                return getattr(_NO_BATTLE, self.name)
+            state = instance.battle_state
+        return getattr(state, self.name)
+
+    def __set__(self, instance, value):
+        if instance._battle is None and value == getattr(_NO_BATTLE, self.name):
+            return  # already what it would be
+        setattr(instance.battle_state, self.name, value)
+
 
 class Player(JSONable):
+    __slots__ = ('_stored', '_saved', '_saved_state', '_owner_id', 'owner', 'name', 'skills', 'pre_skills', 'map', 'area',
+                 '_exp', 'next_level', 'strength', '_magic', '_endurance', 'agility', 'luck', 'resistances', 'inventory',
+                 'arcana', 'specialty', 'description', 'stat_points', 'debug', 'credits', '_active_leaf', 'leaf',
+                 'finished_leaves', 'ap_points', '_unset_skills', 'unset_skills', 'damage_taken', 'sp_used', 'ailment',
+                 '_battle', '_skill_names', '_counter', '_regenerate', '_invigorate', '_boost_amp', '_passive_immunity',
+                 '_passive_evasion', '_resist_table', '_level', '_max_hp', '_max_sp')
+
     __json__ = ('owner', 'name', 'skills', 'exp', 'stats', 'resistances', 'arcana', 'specialty', 'stat_points',
                 'description', 'skill_leaf', 'ap', 'unsetskills', 'finished_leaves', 'credits', 'location', "inventory")
 
-    def keygetter(self, key):
-        if key == 'owner':
-            return self._owner_id
-        if key == 'skills':
-            return [z.name for z in self.skills]
-        if key == 'resistances':
-            return [x.value for x in self.resistances.values()]
-        if key == 'arcana':
-            return self.arcana.value
-        if key == 'specialty':
-            return self.specialty.name
-        if key == 'skill_leaf':
-            return self._active_leaf
-        if key == 'ap':
-            return self.ap_points
-        if key == 'unsetskills':
-            return [z.name for z in self.unset_skills if z.name not in ('Attack', 'Guard')]
-        if key == 'location':
-            return (self.map.name if self.map else None), self.area
-        if key == 'inventory':
-            return self.inventory.to_json()
-        return getattr(self, key)
+    __json_getters__ = {
+        'owner': lambda self: self._owner_id,
+        'skills': lambda self: [z.name for z in self.skills],
+        'resistances': lambda self: [x.value for x in self.resistances.values()],
+        'arcana': lambda self: self.arcana.value,
+        'specialty': lambda self: self.specialty.name,
+        'skill_leaf': lambda self: self._active_leaf,
+        'ap': lambda self: self.ap_points,
+        'unsetskills': lambda self: [z.name for z in self.unset_skills if z.name not in ('Attack', 'Guard')],
+        'location': lambda self: ((self.map.name if self.map else None), self.area),
+        'inventory': lambda self: self.inventory.to_json()
+    }
 
     def __init__(self, **kwargs):
         # kwargs.pop("_id")
+        self._stored = "_id" in kwargs  # came from the database
+        self._saved = None
+        self._saved_state = None  # what the pstate hash has
         self._owner_id = kwargs.pop("owner")
         self.owner = None
         self.name = kwargs.pop("name")
@@ -92,21 +200,8 @@ class Player(JSONable):
 
         self.damage_taken = 0
         self.sp_used = 0
-        self.stat_mod = [0, 0, 0]
-        # [attack][defense][agility]
-        self.until_clear = [0, 0, 0]  # turns until it gets cleared for each stat, max of 3 turns
-        self.guarding = False
-        self.ailment = None
-        self.shields = {}
-        self._ex_crit_mod = 1.0  # handled by the battle system in the pre-loop hook
-        self._rebellion = [False, -1]  # Rebellion or Revolution, [(is enabled), (time until clear)]
-        self._ailment_buff = -1  # > 0: ailment susceptibility is increased
-        self._ex_evasion_mod = 1.0  # handled by the battle system, usually only affected by Pressing Stance
-        self._endured = False
-        self.charging = False
-        self.concentrating = False
-        self._tetrakarn = False
-        self._makarakarn = False
+        self.reset_battle_state()
+        self.refresh_skills()
 
     def __str__(self):
         return self.name
@@ -114,6 +209,31 @@ class Player(JSONable):
     def __repr__(self):
         return f"<({self.arcana.name}) {self.owner}'s  Level {self.level} {self.name!r}>"
 
+    stat_mod = BattleField()
+    until_clear = BattleField()
+    guarding = BattleField()
+    shields = BattleField()
+    _ex_crit_mod = BattleField()
+    _rebellion = BattleField()
+    _ailment_buff = BattleField()
+    _ex_evasion_mod = BattleField()
+    _endured = BattleField()
+    charging = BattleField()
+    concentrating = BattleField()
+    _tetrakarn = BattleField()
+    _makarakarn = BattleField()
+
+    @property
+    def battle_state(self):
+        # made the first time a battle needs it
+        if self._battle is None:
+            self._battle = BattleState()
+        return self._battle
+
+    def reset_battle_state(self):
+        self.ailment = None
+        self._battle = None
+
     async def populate_skills(self, bot):
         self.owner = bot.get_user(self._owner_id)
         if self.map:
@@ -123,13 +243,18 @@ class Player(JSONable):
             self.skills.append(bot.players.skill_cache[skill])
         for skill in self._unset_skills:
             self.unset_skills.append(bot.players.skill_cache[skill])
-
-        sp_used = await bot.redis.get(f'p_sp_used:{self._owner_id}')
-        if sp_used:
-            self.sp_used = int(sp_used)
-        dmg_taken = await bot.redis.get(f'p_dmg_taken:{self._owner_id}')
-        if dmg_taken:
-            self.damage_taken = int(dmg_taken)
+        self.refresh_skills()
+        if self._stored:
+            self.mark_saved()
+
+        *values, sp_day = await bot.redis.hmget(state_key(self._owner_id), *STATE_FIELDS, SP_DAY)
+        for field, value in zip(STATE_FIELDS, values):
+            if value is not None:
+                setattr(self, field, int(value))
+        self._saved_state = self.volatile_state()
+        if sp_day is None or int(sp_day) != daily.today():
+            # its from before the last midnight (or from before there were days)
+            self.sp_used = 0
         return self
 
     def _debug_repr(self):
@@ -182,6 +307,35 @@ class Player(JSONable):
 --- charging: {self.charging}
 --- concentrating: {self.concentrating}"""
 
+    # level, max_hp and max_sp get used all over every turn, theyre only worked out again
+    # when exp or the stat they come from changes
+    @property
+    def exp(self):
+        return self._exp
+
+    @exp.setter
+    def exp(self, value):
+        self._exp = value
+        self._level = self._max_hp = self._max_sp = None
+
+    @property
+    def endurance(self):
+        return self._endurance
+
+    @endurance.setter
+    def endurance(self, value):
+        self._endurance = value
+        self._max_hp = None
+
+    @property
+    def magic(self):
+        return self._magic
+
+    @magic.setter
+    def magic(self, value):
+        self._magic = value
+        self._max_sp = None
+
     @property
     def stats(self):
         return [self.strength, self.magic, self.endurance, self.agility, self.luck]
@@ -201,7 +355,9 @@ class Player(JSONable):
 
     @property
     def max_hp(self):
-        return math.ceil(20 + self.endurance + (4.7 * self.level))
+        if self._max_hp is None:
+            self._max_hp = math.ceil(20 + self._endurance + (4.7 * self.level))
+        return self._max_hp
 
     @property
     def sp(self):
@@ -232,11 +388,15 @@ class Player(JSONable):
 
     @property
     def max_sp(self):
-        return math.ceil(10 + self.magic + (3.6 * self.level))
+        if self._max_sp is None:
+            self._max_sp = math.ceil(10 + self._magic + (3.6 * self.level))
+        return self._max_sp
 
     @property
     def level(self):
-        return max(math.ceil(self.exp ** .333), 1)
+        if self._level is None:
+            self._level = max(math.ceil(self._exp ** .333), 1)
+        return self._level
 
     def level_up(self):
         while self.next_level <= self.level:
@@ -274,32 +434,22 @@ class Player(JSONable):
         self.until_clear[value] = 4
 
     def decrement_stat_modifier(self, modifier=None):
+        # returns the lines to show for reverted modifiers
+        out = []
         if not modifier:  # all modifiers
             for i in range(3):
                 if self.until_clear[i] >= 0:
                     self.until_clear[i] -= 1
                     if self.until_clear[i] == 0:
                         self.stat_mod[i] = 0
-            return
+                        out.append(f"> __{self.name}__'s {STAT_MOD[i]} reverted.")
+            return out
         if self.until_clear[modifier.value] >= 0:
             self.until_clear[modifier.value] -= 1
             if self.until_clear[modifier.value] == 0:
                 self.stat_mod[modifier.value] = 0
-
-    async def decrement_stat_modifier_async(self, battle, modifier=None):
-        if not modifier:  # all modifiers
-            for i in range(3):
-                if self.until_clear[i] >= 0:
-                    self.until_clear[i] -= 1
-                    if self.until_clear[i] == 0:
-                        self.stat_mod[i] = 0
-                        await battle.ctx.send(f"> __{self.name}__'s {STAT_MOD[i]} reverted.")
-            return
-        if self.until_clear[modifier.value] >= 0:
-            self.until_clear[modifier.value] -= 1
-            if self.until_clear[modifier.value] == 0:
-                self.stat_mod[modifier.value] = 0
-                await battle.ctx.send(f"> __{self.name}__'s {STAT_MOD[modifier.value]} reverted.")
+                out.append(f"> __{self.name}__'s {STAT_MOD[modifier.value]} reverted.")
+        return out
 
     def clear_stat_modifier(self, modifier=None):
         if not modifier:  # all modifiers
@@ -318,23 +468,13 @@ class Player(JSONable):
             if self._makarakarn:
                 self._makarakarn = False
                 return ResistanceModifier.REFLECT
+        return self.effective_resistance(type)
 
-        passive = self.get_passive_immunity(type)
-        if passive and not passive.is_evasion:
-            get = passive.immunity_handle()  # instead of resisting if you are weak, the weakness is nullified
-            if self.resistances[type] is ResistanceModifier.WEAK and get is ResistanceModifier.RESIST:
-                return ResistanceModifier.NORMAL
-            return get
-
-        if self.shields.get(type.name.title(), 0) > 0:
+    def effective_resistance(self, type):
+        # same as resists() but doesnt use up tetrakarn/makarakarn
+        if type not in self._passive_immunity and self.shields.get(type.name.title(), 0) > 0:
             return ResistanceModifier.IMMUNE
-
-        try:
-            return self.resistances[type]
-        except KeyError:
-            if not isinstance(type, SkillType):
-                raise
-            return ResistanceModifier.NORMAL
+        return self._resist_table[type]
 
     def is_fainted(self):
         if self.hp <= 0:
@@ -343,49 +483,88 @@ class Player(JSONable):
             return True
         return False
 
-    def get_counter(self):
-        final = None
+    def refresh_skills(self):
+        # rebuilds the skill lookups, call this whenever self.skills changes
+        self._skill_names = frozenset(s.name for s in self.skills)
+
+        self._counter = None
         for skill in self.skills:
             if skill.is_counter_like:
-                if not final:
-                    final = skill
-                else:
-                    if skill.accuracy > final.accuracy:  # high counter has higher priority over counterstrike
-                        final = skill
-        return final
+                if not self._counter or skill.accuracy > self._counter.accuracy:
+                    # high counter has higher priority over counterstrike
+                    self._counter = skill
+
+        self._regenerate = max((s for s in self.skills if s.name.startswith('Regenerate')),
+                               key=lambda s: int(s.name[-1]), default=None)
+        self._invigorate = max((s for s in self.skills if s.name.startswith('Invigorate')),
+                               key=lambda s: int(s.name[-1]), default=None)
+
+        self._boost_amp = {}
+        for type in SkillType:
+            base = 1
+            for skill in self.skills:
+                if skill.name.lower() == f"{type.name.lower()} amp":
+                    base += 0.5
+                elif skill.name.lower() == f"{type.name.lower()} boost":
+                    base += 0.25
+                elif type.name.lower() == 'gun':
+                    if skill.name.lower() == 'snipe':
+                        base += 0.25
+                    elif skill.name.lower() == 'cripple':
+                        base += 0.5
+                elif type.name.lower() in ('light', 'dark'):
+                    if type.name.lower() == 'light' and skill.name.lower() == 'hama boost':
+                        base += 19
+                    elif type.name.lower() == 'dark' and skill.name.lower() == 'mudo boost':
+                        base += 19
+            if base != 1:  # most players have none, no need to keep a 1 for every type
+                self._boost_amp[type] = base
+
+        # passive resistances/evasion, Repel > Absorb > Null > Resist and Evade > Dodge
+        passives = {}
+        self._passive_evasion = {}
+        for skill in self.skills:
+            if not skill.is_passive_immunity:
+                continue
+            kind, _, short = skill.name.partition(" ")
+            type = SHORT_TO_TYPE.get(short.lower())
+            if type is None:
+                continue
+            if skill.is_evasion:
+                current = self._passive_evasion.get(type)
+                if not current or current.accuracy < skill.accuracy:
+                    self._passive_evasion[type] = skill
+            elif type not in passives or IMMUNITY_ORDER.index(kind) < IMMUNITY_ORDER.index(passives[type]):
+                passives[type] = kind
+        self._passive_immunity = passives
+
+        self._resist_table = {}
+        for type in SkillType:
+            base = self.resistances.get(type, ResistanceModifier.NORMAL)
+            if type in passives:
+                get = PASSIVE_HANDLES[passives[type]]
+                # instead of resisting if you are weak, the weakness is nullified
+                if base is ResistanceModifier.WEAK and get is ResistanceModifier.RESIST:
+                    get = ResistanceModifier.NORMAL
+                self._resist_table[type] = get
+            else:
+                self._resist_table[type] = base
+
+    def has_skill(self, name):
+        return name in self._skill_names
+
+    def get_counter(self):
+        return self._counter
 
     def get_passive_immunity(self, type):
-        final = None
-        fmt = re.compile(fr"(Null|Repel|Absorb|Resist) {TYPE_SHORTEN[type.name.lower()].title()}")
-        for skill in self.skills:
-            if skill.is_passive_immunity:
-                find = fmt.findall(skill.name)
-                if not find:
-                    continue
-                find = find[0]
-                if not final or IMMUNITY_ORDER.index(find) < IMMUNITY_ORDER.index(final):
-                    final = find
-        return final
+        return self._passive_immunity.get(type)
 
     def get_passive_evasion(self, type):
-        final = None
-        for skill in self.skills:
-            if skill.name == f"Dodge {TYPE_SHORTEN[type.name.lower()].title()}" and not final:
-                final = skill
-            elif skill.name == f"Evade {TYPE_SHORTEN[type.name.lower()].title()}":
-                final = skill
-                break
-        return final
+        return self._passive_evasion.get(type)
 
     def get_auto_mod(self, modifier):
-        for skill in self.skills:
-            if skill.name == 'Attack Master' and modifier is StatModifier.TARU:
-                return skill
-            if skill.name == 'Defense Master' and modifier is StatModifier.RAKU:
-                return skill
-            if skill.name == 'Speed Master' and modifier is StatModifier.SUKU:
-                return skill
-        return None
+        name = AUTO_MODS.get(modifier)
+        return name is not None and self.has_skill(name)
 
     def get_all_auto_mods(self):
         for mod in (StatModifier.TARU, StatModifier.RAKU, StatModifier.SUKU):
@@ -393,63 +572,32 @@ class Player(JSONable):
                 yield mod
 
     def get_regenerate(self):
-        if any(s.name.startswith('Regenerate') for s in self.skills):
-            return max(filter(lambda s: s.name.startswith('Regenerate'), self.skills), key=lambda s: int(s.name[-1]))
-        return None
+        return self._regenerate
 
     def get_invigorate(self):
-        if any(s.name.startswith('Invigorate') for s in self.skills):
-            return max(filter(lambda s: s.name.startswith('Invigorate'), self.skills), key=lambda s: int(s.name[-1]))
-        return None
+        return self._invigorate
 
     def pre_turn(self):
-        self.decrement_stat_modifier()
-
-        for k in self.shields.copy():
-            if self.shields[k] >= 0:
-                self.shields[k] -= 1
-                if self.shields[k] == 0:
-                    self.shields.pop(k)
-
-        if self._ailment_buff >= 0:
-            self._ailment_buff -= 1
-
-        if self._rebellion[1] >= 0:
-            self._rebellion[1] -= 1
-            if self._rebellion[1] == 0:
-                self._rebellion[0] = False
-
-        reg = self.get_regenerate()
-        if reg:
-            mod = int(reg.name[-1]) * 2
-            self.hp = -(self.max_hp * (mod / 100))
-        inv = self.get_invigorate()
-        if inv:
-            mod = int(inv.name[-1]) * 2 + 1
-            self.sp = -mod
-
-        self.guarding = False
-
-    async def pre_turn_async(self, battle):
-        await self.decrement_stat_modifier_async(battle)
+        # returns the lines to show for anything that wore off
+        out = self.decrement_stat_modifier()
 
         for k in self.shields.copy():
             if self.shields[k] >= 0:
                 self.shields[k] -= 1
                 if self.shields[k] == -1:
                     self.shields.pop(k)
-                    await battle.ctx.send(f"> __{self.name}__'s' {k.title()} immunity reverted.")
+                    out.append(f"> __{self.name}__'s' {k.title()} immunity reverted.")
 
         if self._ailment_buff >= 0:
             self._ailment_buff -= 1
             if self._ailment_buff == -1:
-                await battle.ctx.send(f"> __{self.name}__'s ailment susceptibility reverted.")
+                out.append(f"> __{self.name}__'s ailment susceptibility reverted.")
 
         if self._rebellion[1] >= 0:
             self._rebellion[1] -= 1
             if self._rebellion[1] == 0:
                 self._rebellion[0] = False
-                await battle.ctx.send(f"> __{self.name}__'s critical rate reverted.")
+                out.append(f"> __{self.name}__'s critical rate reverted.")
 
         reg = self.get_regenerate()
         if reg:
@@ -461,25 +609,10 @@ class Player(JSONable):
             self.sp = -mod
 
         self.guarding = False
+        return out
 
     def get_boost_amp_mod(self, type):
-        base = 1
-        for skill in self.skills:
-            if skill.name.lower() == f"{type.name.lower()} amp":
-                base += 0.5
-            elif skill.name.lower() == f"{type.name.lower()} boost":
-                base += 0.25
-            elif type.name.lower() == 'gun':
-                if skill.name.lower() == 'snipe':
-                    base += 0.25
-                elif skill.name.lower() == 'cripple':
-                    base += 0.5
-            elif type.name.lower() in ('light', 'dark'):
-                if type.name.lower() == 'light' and skill.name.lower() == 'hama boost':
-                    base += 19
-                elif type.name.lower() == 'dark' and skill.name.lower() == 'mudo boost':
-                    base += 19
-        return base
+        return self._boost_amp.get(type, 1)
 
     def pre_battle(self):
         for mod in self.get_all_auto_mods():
@@ -487,28 +620,20 @@ class Player(JSONable):
                 self.refresh_stat_modifier(mod)
 
     def post_battle(self, ran=False):
-        self._ex_crit_mod = 1.0
-        self.clear_stat_modifier()
-        self.charging = False
-        self.concentrating = False
-        self._tetrakarn = False
-        self._makarakarn = False
-        self.shields.clear()
-        self._ailment_buff = -1
-        self._endured = False
+        self._battle = None  # buffs, shields, charges etc all wear off, ailments dont
         if self.ailment and self.ailment.type in (AilmentType.SHOCK, AilmentType.FREEZE):
             self.ailment = None
         if not ran:
-            if any(s.name == 'Victory Cry' for s in self.skills):
+            if self.has_skill('Victory Cry'):
                 self.sp_used = 0
                 self.damage_taken = 0
                 return
 
-            if any(s.name == 'Life Aid' for s in self.skills):
+            if self.has_skill('Life Aid'):
                 self.sp = -(self.max_sp * 0.08)
                 self.hp = -(self.max_hp * 0.08)
 
-    def take_damage(self, attacker, skill, *, from_reflect=False, counter=False, enforce_crit=0):
+    def take_damage(self, attacker, skill, *, from_reflect=False, counter=False, enforce_crit=0, rng=None):
         res = self.resists(skill.type)
         result = DamageResult()
         result.skill = skill
@@ -522,22 +647,22 @@ class Player(JSONable):
             if not from_reflect and not counter:
                 # from_reflect -> dont loop reflecting skills
                 # counter -> dont reflect if the skill was countered
-                return attacker.take_damage(self, skill, from_reflect=True)
+                return attacker.take_damage(self, skill, from_reflect=True, rng=rng)
             res = ResistanceModifier.IMMUNE
             result.was_reflected = True
 
         if not skill.uses_sp and not from_reflect and not counter:  # dont double proc counter :^)
             # also only applies to physical skills
             s_counter = self.get_counter()
-            if s_counter and s_counter.try_counter(attacker, self):
-                return attacker.take_damage(self, skill, counter=True)
+            if s_counter and s_counter.try_counter(attacker, self, rng):
+                return attacker.take_damage(self, skill, counter=True, rng=rng)
 
         result.resistance = res
 
         if res is ResistanceModifier.IMMUNE:
             return result
 
-        if enforce_crit == 0 and self.try_evade(attacker, skill):
+        if enforce_crit == 0 and self.try_evade(attacker, skill, rng):
             # we can use enforce_crit here as a back door to determine if we missed the first shot
             # if its 0, this is still the first of a multihit move
             # since we break the hits inside the battle system
@@ -550,7 +675,7 @@ class Player(JSONable):
             result.damage_dealt = self.max_hp
             return result
 
-        base = skill.damage_calc(attacker, self)
+        base = skill.damage_calc(attacker, self, rng)
         base *= attacker.get_boost_amp_mod(skill.type)
         tmp = False
 
@@ -561,10 +686,10 @@ class Player(JSONable):
                 # weakness comes before criticals
                 # guarding also nullifies knock downs, crits and weaknesses
                 if enforce_crit == 0:
-                    if skill.type is SkillType.GUN and any(s.name == 'Trigger Happy' for s in self.skills):
+                    if skill.type is SkillType.GUN and self.has_skill('Trigger Happy'):
                         self._ex_crit_mod += 1.33
                         tmp = True
-                    enforce_crit = 1 if attacker.try_crit(self) else 2
+                    enforce_crit = 1 if attacker.try_crit(self, rng) else 2
                     if tmp:
                         self._ex_crit_mod -= 1.33
                 if enforce_crit == 1:
@@ -590,7 +715,7 @@ class Player(JSONable):
 
         base = math.ceil(base * skill.severity.value)
 
-        if any(s.name == 'Firm Stance' for s in self.skills):
+        if self.has_skill('Firm Stance'):
             base /= 2
 
         if res is not ResistanceModifier.ABSORB:
@@ -603,29 +728,30 @@ class Player(JSONable):
             result.damage_dealt = -base
 
         if self.is_fainted() and not self._endured:
-            if any(s.name == 'Endure' for s in self.skills):
+            if self.has_skill('Endure'):
                 self.damage_taken -= 1
                 result.fainted = False
                 result.endured = self._endured = True
-            elif any(s.name == 'Enduring Soul' for s in self.skills):
+            elif self.has_skill('Enduring Soul'):
                 self.damage_taken = 0
                 result.fainted = False
                 result.endured = self._endured = True
 
         return result
 
-    def try_crit(self, attacker):
+    def try_crit(self, attacker, rng=None):
+        rng = rng or random
         base = CRITICAL_BASE * self._ex_crit_mod
-        if any(s.name == 'Apt Pupil' for s in self.skills):
+        if self.has_skill('Apt Pupil'):
             base *= 3
-        if any(s.name == 'Sharp Student' for s in attacker.skills):
+        if attacker.has_skill('Sharp Student'):
             base /= 3
         if self._rebellion[0]:
             base *= 2
         base += ((self.luck / 10) - ((attacker.luck / 2) / 10))
         base /= attacker.affected_by(StatModifier.SUKU)
         base *= self.affected_by(StatModifier.SUKU)
-        return random.uniform(1, 100) <= base
+        return rng.uniform(1, 100) <= base
 
 # evasion / critical reference
 # In [58]: for my_suku in (0.95, 1.0, 1.05):
@@ -667,11 +793,12 @@ class Player(JSONable):
 # Attacker: 1.00 | Me: 1.05 | 4.20 chance to crit
 # Attacker: 1.05 | Me: 1.05 | 4.00 chance to crit
 
-    def try_evade(self, attacker, skill):
+    def try_evade(self, attacker, skill, rng=None):
+        rng = rng or random
         if (
                 not skill.is_instant_kill or
                 skill.type is not SkillType.AILMENT
-        ) and any(s.name == 'Firm Stance' for s in self.skills):
+        ) and self.has_skill('Firm Stance'):
             # log.debug("Evasion: Firm Stance")
             return False
 
@@ -686,22 +813,23 @@ class Player(JSONable):
             base = skill.accuracy - (self.luck / 10) / 2  # these are actually based off of luck fun fact
             # log.debug(f"instant death or ailment type: {base}")
             base += attacker.get_boost_amp_mod(skill.type)  # light/dark only
-            if self.resists(skill.type) is ResistanceModifier.WEAK:
+            res = self.effective_resistance(skill.type)
+            if res is ResistanceModifier.WEAK:
                 base /= 1.1
                 # log.debug("weak to type")
-            elif self.resists(skill.type) is ResistanceModifier.RESIST:
+            elif res is ResistanceModifier.RESIST:
                 base /= 0.9
                 # log.debug("resists type")
 
         # log.debug(f"new base: {base}")
 
-        if any(s.name == 'Ailment Boost' for s in attacker.skills):
+        if attacker.has_skill('Ailment Boost'):
             base = base + (base * 0.25)
 
         passive = self.get_passive_evasion(skill.type)
         # log.debug(f"passive? {passive}")
         if passive:
-            base += passive.evasion
+            base -= passive.immunity_handle()
 
         my_suku = self.affected_by(StatModifier.SUKU)
         # log.debug(f"defenders sukukaja modifier == {my_suku}, {base / my_suku}")
@@ -717,11 +845,10 @@ class Player(JSONable):
             base *= 2
             # log.debug(f"type is ailment and affected by foul breath, {base}")
 
-        if skill.uses_sp and skill.type is not SkillType.ALMIGHTY and any(
-                s.name == 'Angelic Grace' for s in self.skills):
+        if skill.uses_sp and skill.type is not SkillType.ALMIGHTY and self.has_skill('Angelic Grace'):
             base /= 2
             # log.debug(f"we have angelic grace, {base}")
-        if any(s.name == 'Rainy Play' for s in self.skills):
+        if self.has_skill('Rainy Play'):
             if get_current_weather() is Weather.RAIN:
                 base /= 2
                 # log.debug(f"rain type+rainy play = {base}")
@@ -729,18 +856,83 @@ class Player(JSONable):
                 base /= 3
                 # log.debug(f"severe rain+rainy play = {base}")
 
-        if any(s.name == 'Ambient Aid' for s in attacker.skills) and get_current_weather() is Weather.RAIN:
+        if attacker.has_skill('Ambient Aid') and get_current_weather() is Weather.RAIN:
             base *= 2
 
-        if any(s.name == 'Ali Dance' for s in self.skills):
+        if self.has_skill('Ali Dance'):
             base /= 2
 
-        rng = random.uniform(1, 100)
-        # log.debug(f"rng>base? {rng}, {base}, {rng > base}")
-        return rng > base
+        roll = rng.uniform(1, 100)
+        # log.debug(f"roll>base? {roll}, {base}, {roll > base}")
+        return roll > base
+
+    def _snapshot(self):
+        # the inventory keeps track of itself
+        return {k: to_plain(getter(self)) for k, getter in self._accessors() if k != 'inventory'}
+
+    def mark_saved(self, snapshot=None, inventory=None):
+        self._saved = snapshot or self._snapshot()
+        self.inventory.mark_saved(inventory)
+
+    def build_update(self):
+        """The smallest update that brings the stored document up to date.
+
+        Returns (update, snapshot, inventory snapshot), update is empty if nothing changed"""
+        current = self._snapshot()
+        update = {}
+        for key, value in current.items():
+            old = self._saved[key]
+            if value == old:
+                continue
+            if key in INC_FIELDS and isinstance(value, (int, float)) and isinstance(old, (int, float)):
+                update.setdefault("$inc", {})[key] = value - old
+            else:
+                update.setdefault("$set", {})[key] = value
+        inv_update, inventory = self.inventory.build_update()
+        for op, fields in inv_update.items():
+            update.setdefault(op, {}).update(fields)
+        return update, current, inventory
+
+    def volatile_state(self):
+        return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    def is_dirty(self):
+        if self._saved is None or self._saved_state != self.volatile_state():
+            return True
+        return bool(self.build_update()[0])
+
+    def save_ops(self):
+        """Everything save would write, without writing it, so saves can be batched.
+
+        Returns (mongo op or None, changed pstate fields, done), call done() with whichever got written"""
+        query = {"owner": self._owner_id}
+        if self._saved is None:
+            # never been saved, or we dont know whats stored
+            op = ReplaceOne(query, self.to_json(), upsert=True)
+            snapshot, inventory = self._snapshot(), self.inventory.to_json()
+        else:
+            update, snapshot, inventory = self.build_update()
+            op = UpdateOne(query, update) if update else None
+        state = self.volatile_state()
+        saved = self._saved_state or {}
+        changed = {field: value for field, value in state.items() if saved.get(field) != value}
+        if 'sp_used' in changed:
+            changed[SP_DAY] = daily.today()
+
+        def done(mongo=True, redis=True):
+            if mongo:
+                self._stored = True
+                self.mark_saved(snapshot, inventory)
+            if redis:
+                self._saved_state = state
+        return op, changed, done
 
     async def save(self, bot):
-        data = self.to_json()
-        await bot.db.abyss.accounts.replace_one({"owner": self._owner_id}, data, upsert=True)
-        await bot.redis.set(f'p_sp_used:{self._owner_id}', self.sp_used)
-        await bot.redis.set(f'p_dmg_taken:{self._owner_id}', self.damage_taken)
+        op, changed, done = self.save_ops()
+        if op is not None:
+            await bot.db.abyss.accounts.bulk_write([op])
+        if changed:
+            pipe = userkeys.register(bot.redis.pipeline(), self._owner_id, state_key(self._owner_id))
+            pipe.hmset_dict(state_key(self._owner_id), changed)
+            await pipe.execute()
+        done()
@@ -0,0 +1,75 @@
+from pymongo import UpdateOne
+
+EMPTY_RESISTANCES = [-1 for a in range(10)]
+
+
+class ResearchRecorder:
+    """
+    Holds demonresearch discoveries in memory and writes them out in one bulk_write.
+
+    (user_id, enemy) -> [{resistance index: value}, {move: None}]
+    the moves are a dict so they stay in the order they were learnt
+    """
+    def __init__(self, bot):
+        self.bot = bot
+        self._pending = {}
+
+    def __repr__(self):
+        return f"<ResearchRecorder {len(self._pending)} pending>"
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _entry(self, user_id, enemy):
+        try:
+            return self._pending[user_id, enemy]
+        except KeyError:
+            entry = self._pending[user_id, enemy] = [{}, {}]
+            return entry
+
+    def record_resistance(self, user_id, enemy, type, resistance):
+        self._entry(user_id, enemy)[0][type.value - 1] = resistance.value
+
+    def record_move(self, user_id, enemy, move):
+        self._entry(user_id, enemy)[1][move] = None
+
+    def merge(self, data):
+        # applies anything not yet written to a demonresearch document
+        entry = self._pending.get((data['user_id'], data['enemy']))
+        data['resistances'] = list(data['resistances'])
+        data['moves'] = list(data['moves'])
+        if entry:
+            for index, value in entry[0].items():
+                data['resistances'][index] = value
+            data['moves'].extend(m for m in entry[1] if m not in data['moves'])
+        return data
+
+    def _restore(self, pending):
+        # put back a batch that failed to write, newer discoveries win
+        for key, (ress, moves) in pending.items():
+            entry = self._entry(*key)
+            entry[0] = {**ress, **entry[0]}
+            entry[1] = {**moves, **entry[1]}
+
+    async def flush(self):
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        ops = []
+        for (user_id, enemy), (ress, moves) in pending.items():
+            query = {"user_id": user_id, "enemy": enemy}
+            # cant $setOnInsert the array and $set an index of it in one update
+            ops.append(UpdateOne(query, {"$setOnInsert": {"resistances": EMPTY_RESISTANCES, "moves": []}},
+                                 upsert=True))
+            update = {}
+            if ress:
+                update["$set"] = {f"resistances.{index}": value for index, value in ress.items()}
+            if moves:
+                update["$addToSet"] = {"moves": {"$each": list(moves)}}
+            ops.append(UpdateOne(query, update))
+        try:
+            await self.bot.db.abyss.demonresearch.bulk_write(ops, ordered=True)
+        except Exception:
+            self._restore(pending)
+            raise
+        return len(pending)
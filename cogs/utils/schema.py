@@ -0,0 +1,40 @@
+"""
+The indexes every collection needs, made sure of on startup.
+
+Adding a query on a new field? add its index here too, `$dev indexes` shows
+anything thats missing from the database.
+"""
+
+from pymongo import ASCENDING, IndexModel
+
+INDEXES = {
+    'accounts': [IndexModel([('owner', ASCENDING)], name='owner', unique=True)],
+    'demonresearch': [IndexModel([('user_id', ASCENDING), ('enemy', ASCENDING)], name='user_id_enemy', unique=True)],
+    'encounters': [IndexModel([('name', ASCENDING)], name='name', unique=True)]
+}
+
+# only the fields the callers actually read
+EXISTS = {'_id': 1}
+NO_ID = {'_id': 0}
+
+
+async def ensure_indexes(db):
+    """Creates any missing indexes, returns {collection: exception} for the ones that couldnt be made."""
+    failed = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as exc:  # usually duplicates in a unique index
+            failed[collection] = exc
+    return failed
+
+
+async def index_status(db):
+    """[(collection, index name, keys, exists)] for every index in INDEXES."""
+    status = []
+    for collection, indexes in INDEXES.items():
+        existing = {tuple(info['key']) for info in (await db[collection].index_information()).values()}
+        for index in indexes:
+            keys = tuple(index.document['key'].items())
+            status.append((collection, index.document['name'], keys, keys in existing))
+    return status
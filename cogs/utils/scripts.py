@@ -9,6 +9,8 @@ from contextlib import suppress
 import discord
 from discord.ext import ui
 
+from . import userkeys
+
 KILL_TRACK = {}
 
 NL = '\n'
@@ -76,7 +78,10 @@ class Choices(ui.Session):
             await super().stop()
             await self.message.clear_reactions()
             # log.debug("Choices: remove reactions")
-        await self.context.bot.redis.hset(f"choices@{self.context.author.id}", self.question, self.result)
+        key = f"choices@{self.context.author.id}"
+        pipe = userkeys.register(self.context.bot.redis.pipeline(), self.context.author.id, key)
+        pipe.hset(key, self.question, self.result)
+        await pipe.execute()
         # log.debug("Choices: stop")
 
     async def make_choice(self, payload):
@@ -203,7 +208,10 @@ async def do_script(ctx, script, lang="en_US"):
 async def breakpoint(ctx, scriptnum=None, linenum=None, *, stop=False):
     scriptnum = scriptnum or SCRIPTS.index(ctx.current_script)
     linenum = linenum or ctx.cln
-    await ctx.bot.redis.set(f"breakpoint@{ctx.author.id}", f'{scriptnum}:{linenum}')
+    key = f"breakpoint@{ctx.author.id}"
+    pipe = userkeys.register(ctx.bot.redis.pipeline(), ctx.author.id, key)
+    pipe.set(key, f'{scriptnum}:{linenum}')
+    await pipe.execute()
     await ctx.send("*Saving progress...*", delete_after=3)
     if not stop:
         raise StopScript
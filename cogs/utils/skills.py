@@ -27,16 +27,16 @@ SKILL_BASE = 65  # can be modified if need be
 
 
 class Skill(JSONable):
+    # there are a few hundred of these shared by every player, no __dict__ each
+    __slots__ = ('name', 'type', 'severity', 'cost', 'description', 'accuracy', 'hits', 'target', 'is_evasion')
+
     __json__ = ('name', 'type', 'severity', 'cost', 'accuracy', 'desc')
 
-    def keygetter(self, key):
-        if key == 'type':
-            return self.type.value
-        if key == 'severity':
-            return self.severity.name
-        if key == 'desc':
-            return self.description
-        return getattr(self, key)
+    __json_getters__ = {
+        'type': lambda self: self.type.value,
+        'severity': lambda self: self.severity.name,
+        'desc': lambda self: self.description
+    }
 
     # pylint: disable=self-cls-assignment
     def __new__(cls, **kwargs):
@@ -115,7 +115,12 @@ Skill
     def is_damaging_skill(self):
         return self.type not in (SkillType.HEALING, SkillType.AILMENT, SkillType.SUPPORT, SkillType.PASSIVE)
 
-    def damage_calc(self, attacker, target):
+    def apply(self, user, targets, rng=None):  # pylint: disable=unused-argument
+        # applies the skills side effects, returns the lines to show
+        return []
+
+    def damage_calc(self, attacker, target, rng=None):
+        rng = rng or random
         if self.is_instant_kill:
             return target.hp
 
@@ -145,14 +150,17 @@ Skill
             if attacker.charging:
                 base *= 2.5
 
-        return max(1, base * random.uniform(0.75, 1.25))
+        return max(1, base * rng.uniform(0.75, 1.25))
 
 
 class Counter(Skill):
-    def try_counter(self, user, target):
+    __slots__ = ()
+
+    def try_counter(self, user, target, rng=None):
+        rng = rng or random
         # we use accuracy here as a hack for how often Counter will proc
         base = self.accuracy + (user.luck-target.luck)
-        return random.randint(1, 100) < base
+        return rng.randint(1, 100) < base
 
 
 PASSIVE_HANDLES = {
@@ -163,10 +171,20 @@ PASSIVE_HANDLES = {
 }
 
 
+EVASION_PASSIVES = {
+    "Evade": 20,
+    "Dodge": 10
+}
+
+
 class PassiveImmunity(Skill):
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.is_evasion = self.name.startswith(("Dodge", "Evade"))
+        if self.is_evasion and 'accuracy' not in kwargs:
+            self.accuracy = EVASION_PASSIVES[self.name.split(" ")[0]]
 
     def immunity_handle(self):
         if self.is_evasion:
@@ -175,23 +193,31 @@ class PassiveImmunity(Skill):
 
 
 class ShieldSkill(Skill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         typ = self.name.split(" ")[0]
         for target in targets:
             if target.shields.get(typ):
                 continue
             target.shields[typ] = 3  # little hacky, but its easiest this way
-        await battle.ctx.send(f"> Party become protected by an anti-{typ.lower()} shield!")
+        return [f"> Party become protected by an anti-{typ.lower()} shield!"]
 
 
 class Karn(Skill):
-    async def effect(self, battle, targets):  # pylint: disable=unused-argument
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         target = targets[0]  # single target
         setattr(target, '_'+self.name.lower(), True)
+        return []
 
 
 class StatusMod(Skill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
+        out = []
         if self.name == 'Dekunda':
             for target in targets:
                 did = False
@@ -201,7 +227,7 @@ class StatusMod(Skill):
                         target.until_clear[i] = -1
                         did = True
                 if did:
-                    await battle.ctx.send(f"> __{target}__'s stat decrease nullified.")
+                    out.append(f"> __{target}__'s stat decrease nullified.")
         elif self.name == 'Dekaja':
             for target in targets:
                 did = False
@@ -211,22 +237,22 @@ class StatusMod(Skill):
                         target.until_clear[i] = -1
                         did = True
                 if did:
-                    await battle.ctx.send(f"> __{target}__'s stat increase nullified.")
+                    out.append(f"> __{target}__'s stat increase nullified.")
         elif self.name not in ('Debilitate', 'Heat Riser'):
             boost = 1 if self.name.endswith("kaja") else -1
             mod = StatModifier[self.name[:4].upper()].value
             for target in targets:
                 if target.stat_mod[mod] == boost:
                     target.until_clear[mod] = 4
-                    await battle.ctx.send(f"> __{target}__'s {STAT_MOD[mod]} boost extended.")
+                    out.append(f"> __{target}__'s {STAT_MOD[mod]} boost extended.")
                 else:
                     target.stat_mod[mod] += boost
                     if target.stat_mod[mod] == 0:
                         target.until_clear[mod] = -1
                     else:
                         target.until_clear[mod] = 4
-                    await battle.ctx.send(f"> __{target}__'s {STAT_MOD[mod]} "
-                                          f"{'increased' if boost==1 else 'decreased'}.")
+                    out.append(f"> __{target}__'s {STAT_MOD[mod]} "
+                               f"{'increased' if boost==1 else 'decreased'}.")
         else:
             boost = 1 if self.name == 'Heat Riser' else -1
             for target in targets:
@@ -239,13 +265,17 @@ class StatusMod(Skill):
                             target.until_clear[mod] = -1
                         else:
                             target.until_clear[mod] = 4
-                await battle.ctx.send(f"> __{target}__'s Attack, Defense, Agility/Evasion "
-                                      f"{'increased' if boost==1 else 'decreased'}.")
+                out.append(f"> __{target}__'s Attack, Defense, Agility/Evasion "
+                           f"{'increased' if boost==1 else 'decreased'}.")
+        return out
 
 
 class HealingSkill(Skill):
-    async def effect(self, battle, targets):
-        user = battle.order.active()
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
+        rng = rng or random
+        out = []
         if self.severity is Severity.LIGHT:
             min, max = 40, 60
         elif self.severity is Severity.MEDIUM:
@@ -253,69 +283,82 @@ class HealingSkill(Skill):
         else:
             for target in targets:
                 target.damage_taken = 0
-                await battle.ctx.send(f"> __{target}__ was healed for {target.max_hp} HP!")
-            return
-        if any(s.name == 'Divine Grace' for s in user.skills):
+                out.append(f"> __{target}__ was healed for {target.max_hp} HP!")
+            return out
+        if user.has_skill('Divine Grace'):
             min *= 1.5  # light -> 60, 90
             max *= 1.5  # medium -> 255, 285
         for target in targets:
-            heal = random.uniform(min, max)
+            heal = rng.uniform(min, max)
             target.hp = -heal  # it gets rounded anyways
-            await battle.ctx.send(f"> __{target}__ was healed for {heal:.0f} HP!")
+            out.append(f"> __{target}__ was healed for {heal:.0f} HP!")
+        return out
 
 
 class Salvation(HealingSkill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         for target in targets:
             if target.ailment:
                 target.ailment = None
-        await super().effect(battle, targets)
+        return super().apply(user, targets, rng)
 
 
 class Cadenza(HealingSkill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         for target in targets:
             target.stat_mod[2] += 1
             if target.stat_mod[2] == 0:
                 target.until_clear[2] = -1
             else:
                 target.until_clear[2] = 4
-        await super().effect(battle, targets)
+        return super().apply(user, targets, rng)
 
 
 class Oratorio(HealingSkill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         for target in targets:
             for mod in range(3):
                 if target.stat_mod[mod] == -1:
                     target.stat_mod[mod] = 0
                     target.until_clear[mod] = -1
-        await super().effect(battle, targets)
+        return super().apply(user, targets, rng)
 
 
 class Charge(Skill):
-    async def effect(self, battle, targets):
+    __slots__ = ()
+
+    def apply(self, user, targets, rng=None):
         target = targets[0]  # only targets the user
         if self.name == 'Charge':
             target.charging = True
         else:
             target.concentrating = True
-        await battle.ctx.send(f"> __{target}__ is focused!")
+        return [f"> __{target}__ is focused!"]
 
 
 class AilmentSkill(Skill):
+    __slots__ = ('ailment',)
+
     def __init__(self, **kwargs):
         self.ailment = AilmentType[kwargs.pop('ailment').upper()]
         super().__init__(**kwargs)
 
-    async def effect(self, battle, targets):
+    def apply(self, user, targets, rng=None):
         ailment = getattr(ailments, self.ailment.name.title())
+        out = []
         for target in targets:
             if target.ailment is not None:
                 continue
-            if not target.try_evade(battle.order.active(), self):  # ailment landed
-                target.ailment = ailment(target, self.ailment)
-                await battle.ctx.send(f"> __{target}__ was inflicted with **{target.ailment.name}**")
+            if not target.try_evade(user, self, rng):  # ailment landed
+                target.ailment = ailment(target, self.ailment, rng)
+                out.append(f"> __{target}__ was inflicted with **{target.ailment.name}**")
+        return out
 
 
 SUBCLASSES = {
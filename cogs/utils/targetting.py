@@ -9,7 +9,7 @@ import tabulate
 from discord.ext import ui
 
 from .enums import AilmentType, ResistanceModifier, SkillType
-from . import lookups
+from . import lookups, schema
 
 
 NL = '\n'
@@ -228,7 +228,7 @@ VS
             e = lookups.TYPE_TO_EMOJI[skill.type.name.lower()]
             if skill.uses_sp:
                 cost = skill.cost
-                if any(s.name == 'Spell Master' for s in self.player.skills):
+                if self.player.has_skill('Spell Master'):
                     cost /= 2
                 can_use = self.player.sp >= cost
                 if skill.name != 'Guard' and self.player.ailment and self.player.ailment.type is AilmentType.FORGET:
@@ -237,7 +237,7 @@ VS
             else:
                 if skill.cost != 0:
                     cost = self.player.max_hp * (skill.cost / 100)
-                    if any(s.name == 'Arms Master' for s in self.player.skills):
+                    if self.player.has_skill('Arms Master'):
                         cost /= 2
                 else:
                     cost = 0
@@ -297,10 +297,13 @@ Lunge | Lunge```''', inline=False)
         target = target[0]
         p = discord.Embed(title=f'[Wild] {target.name} ● Lv. {target.level_}')
         p.description = f'{target.max_hp} Max HP ● {target.max_sp} Max SP'
-        res_data = await self.context.bot.db.abyss.demonresearch.find_one({"user_id": self.player.owner.id, "enemy": target.name})
+        res_data = await self.context.bot.db.abyss.demonresearch.find_one(
+            {"user_id": self.player.owner.id, "enemy": target.name}, schema.NO_ID)
         if not res_data:
             res_data = FAKE_ENEMY_DATA.copy()
+            res_data['user_id'] = self.player.owner.id
             res_data['enemy'] = target.name
+        res_data = self.context.bot.get_cog("BattleSystem").research.merge(res_data)
         fdata = {}
         for res, val in zip(SkillType, res_data['resistances']):
             if val != -1:
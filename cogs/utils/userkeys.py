@@ -0,0 +1,67 @@
+"""
+Every redis key that belongs to a user gets added to a set for that user,
+so deleting/resetting someone is one pipelined UNLINK instead of a SCAN
+over the whole keyspace.
+
+    pipe = userkeys.register(bot.redis.pipeline(), user.id, key)
+    pipe.set(key, 1)
+    await pipe.execute()
+
+Locale settings arent registered, they survive account deletion.
+"""
+
+import re
+
+# what per user keys look like, only used to backfill the sets for keys written before them
+USER_KEY_PATTERNS = [re.compile(p) for p in (
+    r'^pstate:(\d+)$',
+    r'^p_sp_used:(\d+)$',
+    r'^p_dmg_taken:(\d+)$',
+    r'^treasures_found:(\d+)$',
+    r'^open_chests:(\d+)$',
+    r'^(\d+):searchedmap-.+$',
+    r'^breakpoint@(\d+)$',
+    r'^choices@(\d+)$'
+)]
+
+
+def registry_key(user_id):
+    return f'userkeys:{user_id}'
+
+
+def register(pipe, user_id, *keys):
+    # queues the registration on a pipeline (or runs it, for a plain connection)
+    pipe.sadd(registry_key(user_id), *keys)
+    return pipe
+
+
+async def delete_all(redis, user_id):
+    """Unlinks every registered key of a user and the set itself, returns how many keys there were."""
+    keys = await redis.smembers(registry_key(user_id))
+    pipe = redis.pipeline()
+    if keys:
+        pipe.unlink(*keys)
+    pipe.unlink(registry_key(user_id))
+    await pipe.execute()
+    return len(keys)
+
+
+async def backfill(redis, *, count=1000):
+    """Registers keys that were written before the sets existed. Returns how many were registered.
+
+    This does SCAN everything, so its only for migrating, never for a command."""
+    found = 0
+    cur = None
+    while cur != 0:
+        cur, keys = await redis.scan(cur or 0, count=count)
+        pipe = redis.pipeline()
+        for key in keys:
+            name = key.decode()
+            for pattern in USER_KEY_PATTERNS:
+                match = pattern.match(name)
+                if match:
+                    register(pipe, match.group(1), name)
+                    found += 1
+                    break
+        await pipe.execute()
+    return found
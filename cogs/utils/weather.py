@@ -1,5 +1,6 @@
+import functools
 import random
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .enums import Weather, SevereWeather, Season
 from .lookups import WIND_SPEED_SEASON, WIND_SPEED_WEATHER
@@ -50,8 +51,8 @@ def try_severe_weather(season, weather, state=None):
     return rng.random() < 0.1
 
 
-def get_current_weather(date=None):
-    season = get_current_season()
+def _roll_weather(day):
+    season = get_current_season(day)
     chances = VARIATE.copy()
 
     if season is Season.SPRING:
@@ -73,10 +74,8 @@ def get_current_weather(date=None):
         chances[2] = 0.01  # rare rain
         chances[3] += 0.29  # more snow
 
-    now = date or datetime.utcnow()
-    dt = datetime(now.year, now.month, now.day)
-    nrand = random.Random(int(dt.timestamp()))
-    weather = nrand.choices([w.value for w in Weather], cum_weights=chances)[0]
+    nrand = random.Random(int(day.timestamp()))
+    weather = nrand.choices([w.value for w in Weather], weights=chances)[0]
     weather = Weather(weather)
 
     if weather is not Weather.FOGGY:
@@ -87,20 +86,52 @@ def get_current_weather(date=None):
     return weather
 
 
-def get_wind_speed(date=None):  # KM/H
-    now = date or datetime.utcnow()
-    dt = datetime(now.year, now.month, now.day)
+def _roll_wind_speed(day, weather):  # KM/H
     min_speed = 1
     max_speed = 20
 
-    season = get_current_season(now)
+    season = get_current_season(day)
     min_speed += WIND_SPEED_SEASON[season]
     max_speed += WIND_SPEED_SEASON[season]
 
-    weather = get_current_weather(now)
     min_speed += WIND_SPEED_WEATHER[weather]
     max_speed += WIND_SPEED_WEATHER[weather]
 
-    nrand = random.Random(int(dt.timestamp()))
+    nrand = random.Random(int(day.timestamp()))
     speed = nrand.randint(max(min_speed + 1, 1), max(max_speed + 1, 1))
     return speed-1
+
+
+@functools.lru_cache(maxsize=4)
+def get_calendar(year):
+    # (weather, wind speed) for every day of the year, index 0 is the 1st of january
+    # every day is seeded by its own timestamp so this is the same on every cluster
+    days = []
+    day = datetime(year, 1, 1)
+    while day.year == year:
+        weather = _roll_weather(day)
+        days.append((weather, _roll_wind_speed(day, weather)))
+        day += timedelta(days=1)
+    return tuple(days)
+
+
+def _get_day(date=None):
+    now = date or datetime.utcnow()
+    return get_calendar(now.year)[now.timetuple().tm_yday - 1]
+
+
+def get_current_weather(date=None):
+    return _get_day(date)[0]
+
+
+def get_wind_speed(date=None):  # KM/H
+    return _get_day(date)[1]
+
+
+def get_forecast(start, days=7):
+    # [(date, weather, wind speed), ...]
+    out = []
+    for day in range(days):
+        date = start + timedelta(days=day)
+        out.append((date, *_get_day(date)))
+    return out
@@ -1,6 +1,7 @@
 import asyncio
 from datetime import datetime
 
+import aiohttp
 import discord
 import logging
 import multiprocessing
@@ -11,6 +12,7 @@ import sys
 import time
 
 import requests
+from discord.backoff import ExponentialBackoff
 
 # from bot_mp import ClusterBot
 from bot.bot import Abyss
@@ -32,19 +34,131 @@ CLUSTER_NAMES = (
 )
 NAMES = iter(CLUSTER_NAMES)
 
-webhook_logger = discord.Webhook.from_url(DEBUG_WEBHOOK, adapter=discord.RequestsWebhookAdapter())
 
 
-def get_shard_count():
+BOOT_TIMEOUT = 300  # seconds a cluster gets to say its ready before we stop waiting on it
+MAX_WEBHOOK_RETRIES = 5  # ratelimits in a row before a batch gets dropped
+
+
+def get_gateway():
+    # (shard count, how many shards can identify at the same time)
     data = requests.get('https://discordapp.com/api/v7/gateway/bot', headers={
         "Authorization": "Bot " + TOKEN,
         "User-Agent": "DiscordBot (https://github.com/Rapptz/discord.py 1.3.0a) Python/3.7 aiohttp/3.6.1"
     })
     data.raise_for_status()
     content = data.json()
-    log.info(f"Successfully got shard count of {content['shards']} ({data.status_code, data.reason})")
+    max_concurrency = content.get('session_start_limit', {}).get('max_concurrency', 1)
+    log.info(f"Successfully got shard count of {content['shards']}, max concurrency {max_concurrency} "
+             f"({data.status_code, data.reason})")
     # return 16
-    return content['shards']
+    return content['shards'], max_concurrency
+
+
+def identify_waves(clusters, max_concurrency):
+    """Groups clusters so that no two in a group have shards in the same identify bucket.
+
+    A shards bucket is shard_id % max_concurrency, and only one shard per bucket can identify at once,
+    so a whole group can be started together."""
+    waves = []
+    for cluster in clusters:
+        buckets = {shard_id % max_concurrency for shard_id in cluster.shard_ids}
+        for wave, used in waves:
+            if not used & buckets:
+                wave.append(cluster)
+                used |= buckets
+                break
+        else:
+            waves.append(([cluster], buckets))
+    return [wave for wave, _ in waves]
+
+
+class WebhookShipper:
+    """
+    Sends the launchers embeds to the debug webhook from a background task.
+
+    Whatever queued up since the last post goes out together, up to 10 embeds a message.
+    When the queue is full new embeds are dropped, and how many went gets sent with the next post.
+    Nothing that calls send ever waits on the webhook.
+    """
+    def __init__(self, loop, url, *, max_size=100):
+        self.loop = loop
+        self.url = url
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+        self.session = None
+        self.webhook = None
+        self.task = None
+
+    def send(self, colour, message):
+        if not self.url:
+            return
+        embed = discord.Embed(colour=colour, title=message, timestamp=datetime.utcnow())
+        try:
+            self.queue.put_nowait(embed)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self):
+        if self.url and self.task is None:
+            self.task = self.loop.create_task(self.run())
+
+    def _batch(self, first):
+        # (embeds to post, how many of them came off the queue)
+        embeds = [first]
+        while len(embeds) < 10 and not self.queue.empty():
+            embeds.append(self.queue.get_nowait())
+        taken = len(embeds)
+        if self.dropped and len(embeds) < 10:
+            embeds.append(discord.Embed(colour=discord.Colour.gold(), title=f"{self.dropped} log messages dropped",
+                                        timestamp=datetime.utcnow()))
+            self.dropped = 0
+        return embeds, taken
+
+    async def post(self, embeds):
+        backoff = ExponentialBackoff()
+        for _ in range(MAX_WEBHOOK_RETRIES):
+            try:
+                await self.webhook.send(embeds=embeds)
+                return
+            except discord.HTTPException as exc:
+                if exc.status != 429:
+                    log.warning(f"Couldnt send {len(embeds)} embeds to the webhook: {exc}")
+                    return
+                await asyncio.sleep(backoff.delay())
+            except aiohttp.ClientError as exc:
+                log.warning(f"Couldnt send {len(embeds)} embeds to the webhook: {exc!r}")
+                return
+        # a cloudflare ban is a 429 too, and that one isnt going away
+        log.warning(f"Gave up on {len(embeds)} embeds after {MAX_WEBHOOK_RETRIES} ratelimits")
+
+    async def run(self):
+        self.session = aiohttp.ClientSession()
+        self.webhook = discord.Webhook.from_url(self.url, adapter=discord.AsyncWebhookAdapter(self.session))
+        while True:
+            embeds, taken = self._batch(await self.queue.get())
+            try:
+                await self.post(embeds)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # drop the batch, if this task dies nothing gets shipped and close waits on join for nothing
+                log.exception(f"Couldnt send {len(embeds)} embeds to the webhook")
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+
+    async def close(self, timeout=10):
+        # sends whats left, as long as that doesnt take forever
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Gave up on {self.queue.qsize()} webhook messages")
+        self.task.cancel()
+        if self.session is not None:
+            await self.session.close()
 
 
 class Launcher:
@@ -62,20 +176,21 @@ class Launcher:
 
         self.start_ipc = ipc
         self.ipc = None
+        self.max_concurrency = 1
+
+        self.shipper = WebhookShipper(loop, DEBUG_WEBHOOK)
 
     def info(self, message):
-        embed = discord.Embed(colour=discord.Colour.green(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.shipper.send(discord.Colour.green(), message)
 
     def warn(self, message):
-        embed = discord.Embed(colour=discord.Colour.gold(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.shipper.send(discord.Colour.gold(), message)
 
     def error(self, message):
-        embed = discord.Embed(colour=discord.Colour.red(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.shipper.send(discord.Colour.red(), message)
 
     def start(self):
+        self.shipper.start()
         self.info("[Launcher] Starting up")
         self.fut = asyncio.ensure_future(self.startup(), loop=self.loop)
 
@@ -105,6 +220,7 @@ class Launcher:
 
     def cleanup(self):
         self.info("[Launcher] Cleaning up tasks")
+        self.loop.run_until_complete(self.shipper.close())
         self._cleanup()
         self.loop.stop()
         if sys.platform == 'win32':
@@ -128,14 +244,15 @@ class Launcher:
             self.ipc = multiprocessing.Process(target=ipc.start, daemon=True)
             self.ipc.start()
 
-        shards = list(range(get_shard_count()))
+        shard_count, self.max_concurrency = get_gateway()
+        shards = list(range(shard_count))
         size = [shards[x:x + 4] for x in range(0, len(shards), 4)]
         log.info(f"Preparing {len(size)} clusters")
         self.info(f"[Launcher] Starting {len(size)}C / {len(shards)}S")
         for shard_ids in size:
             self.cluster_queue.append(Cluster(self, next(NAMES), shard_ids, len(shards)))
 
-        await self.start_cluster()
+        await self.start_clusters()
         self.keep_alive = self.loop.create_task(self.rebooter())
         self.keep_alive.add_done_callback(self.task_complete)
         log.info(f"Startup completed in {time.perf_counter() - self.init:.2f}s")
@@ -166,13 +283,14 @@ class Launcher:
                 self.ipc = None
 
             to_remove = []
+            to_restart = []
             for cluster in self.clusters:
                 if not cluster.process.is_alive():
                     if cluster.process.exitcode != 0:
                         # ignore safe exits
                         self.warn(f'[Cluster#{cluster.name}] Exited with status {cluster.process.exitcode}, restarting')
                         log.info(f"Cluster#{cluster.name} exited with code {cluster.process.exitcode}, restarting")
-                        await cluster.start()
+                        to_restart.append(cluster)
                     else:
                         self.warn(f"[Launcher] Found Cluster#{cluster.name} dead with status 0.")
                         log.info(f"Cluster#{cluster.name} found dead")
@@ -180,20 +298,35 @@ class Launcher:
                         cluster.stop()  # ensure stopped
             for rem in to_remove:
                 self.clusters.remove(rem)
+            if to_restart:
+                await self.launch(to_restart)
             await asyncio.sleep(5)
 
-    async def start_cluster(self):
-        if self.cluster_queue:
-            cluster = self.cluster_queue.pop(0)
-            self.info(f"[Launcher] Starting Cluster#{cluster.name}")
-            log.info(f"Starting Cluster#{cluster.name}")
-            await cluster.start()
-            log.info("Done!")
-            self.clusters.append(cluster)
-            await self.start_cluster()
+    async def launch(self, clusters):
+        # everything in a wave boots at once, the next wave goes once its ready (or timed out)
+        start = time.perf_counter()
+        for wave in identify_waves(clusters, self.max_concurrency):
+            names = ', '.join(f"Cluster#{cluster.name}" for cluster in wave)
+            self.info(f"[Launcher] Starting {names}")
+            log.info(f"Starting {names}")
+            await asyncio.gather(*(cluster.start() for cluster in wave))
+        total = time.perf_counter() - start
+        times = ', '.join(f"{cluster.name} {cluster.boot_time:.1f}s" if cluster.boot_time is not None
+                          else f"{cluster.name} timed out" for cluster in clusters)
+        log.info(f"Launched {len(clusters)} clusters in {total:.2f}s ({times})")
+        return total
+
+    async def start_clusters(self):
+        clusters, self.cluster_queue = self.cluster_queue, []
+        self.clusters.extend(clusters)
+        total = await self.launch(clusters)
+        failed = [cluster.name for cluster in clusters if cluster.boot_time is None]
+        if failed:
+            log.warning(f"Clusters not ready in time: {', '.join(failed)}")
+            self.warn(f"[Launcher] Launched all clusters in {total:.2f}s, not ready in time: {', '.join(failed)}")
         else:
             log.info("All clusters launched")
-            self.info("[Launcher] Successfully launched all clusters")
+            self.info(f"[Launcher] Successfully launched all clusters in {total:.2f}s")
 
 
 class Cluster:
@@ -206,6 +339,8 @@ class Cluster:
             cluster_name=name
         )
         self.name = name
+        self.shard_ids = shard_ids
+        self.boot_time = None  # seconds the last start took to be ready, None if it never said so
         self.log = logging.getLogger(f"Cluster#{name}")
         self.log.setLevel(logging.DEBUG)
         hdlr = logging.StreamHandler()
@@ -216,16 +351,13 @@ class Cluster:
         self.log.info(f"Initialized with shard ids {shard_ids}, total shards {max_shards}")
 
     def info(self, message):
-        embed = discord.Embed(colour=discord.Colour.green(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.launcher.info(message)
 
     def warn(self, message):
-        embed = discord.Embed(colour=discord.Colour.gold(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.launcher.warn(message)
 
     def error(self, message):
-        embed = discord.Embed(colour=discord.Colour.red(), title=message, timestamp=datetime.utcnow())
-        webhook_logger.send(embed=embed)
+        self.launcher.error(message)
 
     def wait_close(self):
         return self.process.join()
@@ -243,14 +375,29 @@ class Cluster:
         stdout, stdin = multiprocessing.Pipe()
         kw = self.kwargs
         kw['pipe'] = stdin
+        self.boot_time = None
+        start = time.perf_counter()
         self.process = multiprocessing.Process(target=Abyss, kwargs=kw, daemon=True)
         self.process.start()
         self.log.info(f"Process started with PID {self.process.pid}")
 
-        if await self.launcher.loop.run_in_executor(None, stdout.recv) == 1:
+        if not await self.launcher.loop.run_in_executor(None, stdout.poll, BOOT_TIMEOUT):
+            # leave it running, it might just be slow, the rebooter deals with it if it dies
+            self.log.warning(f"Not ready after {BOOT_TIMEOUT}s")
+            self.warn(f"[Cluster#{self.name}] Not ready after {BOOT_TIMEOUT}s")
+            return False
+
+        try:
+            ready = await self.launcher.loop.run_in_executor(None, stdout.recv)
+        except EOFError:
+            self.log.warning("Process exited before it was ready")
+            return False
+
+        if ready == 1:
             stdout.close()
-            self.log.info("Process started successfully")
-            self.info(f"[Cluster#{self.name}] Successfully loaded")
+            self.boot_time = time.perf_counter() - start
+            self.log.info(f"Process started successfully in {self.boot_time:.2f}s")
+            self.info(f"[Cluster#{self.name}] Successfully loaded in {self.boot_time:.2f}s")
 
         return True
 
@@ -0,0 +1,48 @@
+import json
+import pathlib
+
+import pytest
+
+from cogs.utils import i18n  # noqa: F401 installs _
+from cogs.utils.battle import Enemy
+from cogs.utils.inventory import Inventory
+from cogs.utils.objects import CaseInsensitiveDict
+from cogs.utils.player import Player
+from cogs.utils.skills import GenericAttack, Guard, Skill
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope='session')
+def skill_cache():
+    with open(ROOT / 'skill-data.json') as f:
+        cache = CaseInsensitiveDict({s['name']: Skill(**s) for s in json.load(f)})
+    cache['Attack'] = GenericAttack
+    cache['Guard'] = Guard
+    return cache
+
+
+@pytest.fixture(scope='session')
+def demons():
+    with open(ROOT / 'base-demons.json') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def make_player(skill_cache):
+    def make(data, owner=1):
+        data = dict(data, owner=owner)
+        data['skills'] = [skill_cache[name] for name in sorted({'Attack', 'Guard', *data['skills']})]
+        player = Player(**data)
+        player.inventory = Inventory(None, player, {})
+        return player
+    return make
+
+
+@pytest.fixture
+def make_enemy(skill_cache):
+    def make(data, level=3, cls=Enemy):
+        moves = data['skills']
+        data = {k: v for k, v in data.items() if k not in ('owner', 'exp', 'arcana', 'specialty', 'skills')}
+        return cls.prototype(dict(data, moves=moves, level=level), skill_cache).spawn()
+    return make
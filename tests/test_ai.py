@@ -0,0 +1,53 @@
+from cogs.utils import ai
+from cogs.utils.engine import BattleEngine
+from cogs.utils.enums import ResistanceModifier, SkillType
+
+NORMAL = ResistanceModifier.NORMAL.value
+
+
+def resistances(**overrides):
+    out = [NORMAL] * 10
+    for name, modifier in overrides.items():
+        out[SkillType[name.upper()].value - 1] = modifier.value
+    return out
+
+
+def test_affordable_skills_follow_sp(demons, make_enemy):
+    enemy = make_enemy(dict(demons[0], skills=['Agi', 'Agilao', 'Maragi']), level=10)
+    enemy.sp_used = enemy.max_sp - 9
+
+    names = {s.name for s in enemy.book.affordable(enemy.sp)}
+    assert names == {'Attack', 'Guard', 'Agi', 'Agilao'}
+
+    enemy.pay_for(next(s for s in enemy.skills if s.name == 'Agilao'))
+    assert enemy.sp == 1
+    assert {s.name for s in enemy.book.affordable(enemy.sp)} == {'Attack', 'Guard'}
+
+    enemy.sp_used = 0
+    assert 'Maragi' in {s.name for s in enemy.book.affordable(enemy.sp)}
+
+
+def test_learnt_unusable_skills_get_left_out(demons, make_enemy):
+    enemy = make_enemy(dict(demons[0], skills=['Agi', 'Bufu']), level=10)
+    enemy.book.mark_unusable('Agi')
+    assert 'Agi' not in {s.name for s in enemy.book.affordable(enemy.sp)}
+    assert not enemy.spawn().book.unusable  # every spawn starts without knowing anything
+
+
+def test_resistance_policy_goes_for_the_weakness(demons, make_player, make_enemy):
+    player = make_player(dict(demons[0], resistances=resistances(
+        fire=ResistanceModifier.REFLECT, ice=ResistanceModifier.WEAK, electric=ResistanceModifier.IMMUNE)))
+    for seed in range(20):
+        enemy = make_enemy(dict(demons[0], skills=['Agi', 'Bufu', 'Zio'], ai='resistance'), level=10)
+        engine = BattleEngine([player], [enemy], seed=seed, enemy_policy=ai.enemy_policy)
+        sp = enemy.sp
+        skill, targets = engine.enemy_policy(engine, enemy)
+        assert skill.name == 'Bufu'
+        assert targets == (player,)
+        assert enemy.sp == sp - 4  # paid for it
+
+
+def test_enemies_play_random_without_an_ai(demons, make_enemy):
+    enemy = make_enemy(dict(demons[0], skills=['Agi']))
+    assert enemy.policy is ai.random_policy
+    assert make_enemy(dict(demons[0], skills=['Agi'], ai='support')).policy is ai.support_policy
@@ -0,0 +1,114 @@
+import asyncio
+
+from cogs.utils.cache import PlayerCache
+
+
+class FakePlayer:
+    def __init__(self, owner_id):
+        self._owner_id = owner_id
+        self.inventory = None
+        self.dirty = True
+        self.credits = 100  # unsaved, goes out as an $inc
+
+    def is_dirty(self):
+        return self.dirty
+
+
+class FakeBot:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+
+    def get_cog(self, name):
+        return None
+
+
+class SlowCache(PlayerCache):
+    # saving takes a moment, and fails for whoever is in `fail`
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail = set()
+        self.sent = []  # (owner, credits) for every $inc that went out
+
+    async def _save_batch(self, players):
+        # sent straight away, but only marked as saved once the write comes back
+        self.sent.extend((p._owner_id, p.credits) for p in players)
+        await asyncio.sleep(0.01)
+        for player in players:
+            player.dirty = player._owner_id in self.fail
+            if not player.dirty:
+                player.credits = 0
+        return [p for p in players if p._owner_id in self.fail]
+
+
+def run(cache, coro):
+    return cache.bot.loop.run_until_complete(coro)
+
+
+def make_cache(*owner_ids):
+    cache = SlowCache(FakeBot())
+    for owner_id in owner_ids:
+        cache._players[owner_id] = FakePlayer(owner_id)
+        cache._used[owner_id] = 0
+    return cache
+
+
+def test_players_stay_cached_until_saved():
+    cache = make_cache(1, 2)
+
+    async def drop_and_look():
+        task = asyncio.ensure_future(cache._drop([1, 2]))
+        await asyncio.sleep(0)
+        still_there = 1 in cache and 2 in cache  # a load here must not go to the database
+        return still_there, await task
+
+    still_there, dropped = run(cache, drop_and_look())
+    assert still_there
+    assert dropped == 2
+    assert len(cache) == 0
+
+
+def test_failed_save_keeps_the_cached_player():
+    cache = make_cache(1, 2)
+    cache.fail.add(1)
+    player = cache._players[1]
+    assert run(cache, cache._drop([1, 2])) == 1
+    assert cache._players[1] is player
+    assert 2 not in cache
+
+
+def test_overlapping_saves_only_send_once():
+    cache = make_cache(1, 2)
+
+    async def flush_and_evict():
+        await asyncio.gather(cache.flush(), cache.evict(1))
+
+    run(cache, flush_and_evict())
+    assert sorted(cache.sent) == [(1, 100), (2, 100)]
+    assert 1 not in cache and 2 in cache
+
+
+def test_cancelled_flush_still_finishes_the_write():
+    cache = make_cache(1)
+
+    async def cancel_then_flush():
+        task = asyncio.ensure_future(cache.flush())
+        await asyncio.sleep(0)
+        task.cancel()
+        return await cache.flush()
+
+    run(cache, cancel_then_flush())
+    assert cache.sent == [(1, 100)]
+    assert not cache._players[1].is_dirty()
+
+
+def test_discard_waits_for_the_running_save():
+    cache = make_cache(1)
+
+    async def save_then_discard():
+        task = asyncio.ensure_future(cache.flush())
+        await asyncio.sleep(0)
+        await cache.discard(1)
+        return task.done()
+
+    assert run(cache, save_then_discard())
+    assert 1 not in cache
@@ -0,0 +1,22 @@
+import random
+
+from cogs.utils import ailments
+from cogs.utils.engine import BattleEngine
+from cogs.utils.enums import AilmentType
+from cogs.utils.inventory import Inventory
+
+
+def test_spawned_enemies_get_their_own_inventory(demons, make_enemy):
+    enemy = make_enemy(demons[0])
+    assert isinstance(enemy.inventory, Inventory)
+    assert enemy.spawn().inventory is not enemy.inventory
+
+
+def test_confused_enemy_can_take_its_turn(demons, make_player, make_enemy):
+    for seed in range(50):
+        rng = random.Random(seed)
+        enemy = make_enemy(rng.choice(demons))
+        engine = BattleEngine([make_player(rng.choice(demons))], [enemy], seed=seed)
+        engine.pre_battle()
+        enemy.ailment = ailments.Confuse(enemy, AilmentType.CONFUSE, rng)
+        engine.start_turn(enemy)  # used to raise AttributeError going through {}.items
@@ -0,0 +1,33 @@
+import random
+
+from cogs.utils.engine import BattleEngine
+
+
+def play(engine, max_steps=5000):
+    # like BattleEngine.run, but gives up instead of hanging
+    engine.pre_battle()
+    steps = 0
+    while not engine.stopped and engine.turn_cycle <= engine.max_turns and steps < max_steps:
+        engine.step()
+        steps += 1
+    return steps
+
+
+def test_battle_with_a_fainted_player_ends(demons, make_player, make_enemy):
+    for seed in range(100):
+        rng = random.Random(seed)
+        players = [make_player(rng.choice(demons), owner=1), make_player(rng.choice(demons), owner=2)]
+        engine = BattleEngine(players, [make_enemy(rng.choice(demons))], seed=seed)
+        steps = play(engine)
+        assert steps < 5000, f"seed {seed} never ended"
+        assert engine.stopped or engine.turn_cycle > engine.max_turns
+
+
+def test_fainted_player_gets_skipped(demons, make_player, make_enemy):
+    players = [make_player(demons[0], owner=1), make_player(demons[1], owner=2)]
+    engine = BattleEngine(players, [make_enemy(demons[2])], seed=0)
+    engine.pre_battle()
+    fainted = engine.order.active()
+    fainted.hp = fainted.max_hp
+    assert not engine.start_turn(fainted)
+    assert engine.order.active() is not fainted